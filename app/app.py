@@ -1,13 +1,22 @@
-from flask import Flask, request, redirect, render_template, url_for, jsonify
+from flask import Flask, request, redirect, render_template, session, url_for, jsonify
 from transformers import M2M100ForConditionalGeneration, M2M100Tokenizer
 from transformers import pipeline   # <-- For DeepSeek pipeline
-from langdetect import detect, LangDetectException
 import sentencepiece  # Needed by M2M100 for tokenization
 from gtts import gTTS
 import os
 import uuid
 
+from audio_store import AudioStore
+from conversation_store import open_store
+from decoding import CHAT_PRESETS, TRANSLATION_PRESETS
+from language_id import LanguageIdentifier
+from lang_tokenizers import TokenizerPool
+from model_registry import ModelNotEnabled, ModelRegistry
+from streaming import sse_response, sse_stream, stream_generation, wants_stream
+
 app = Flask(__name__)
+# Signs the session cookie that identifies each chat conversation; set it in production
+app.secret_key = os.environ.get("FLASK_SECRET_KEY", "dev-secret-key")
 
 # Map language names to M2M100 language codes
 LANGUAGES = {
@@ -23,10 +32,43 @@ LANGUAGES = {
     'Arabic': 'ar'
 }
 
-# Load the M2M100 model & tokenizer for translation
+# Models are loaded on first use. ENABLED_MODELS picks which ones this
+# deployment may load (e.g. "translation" only) and MODEL_WARMUP=1 loads
+# them at startup instead of on the first request.
+models = ModelRegistry.from_env()
+
+# Decoding presets for this deployment (see decoding.py): 'fast-greedy', 'balanced' or 'quality-beam'
+DECODING_PRESET = os.environ.get("DECODING_PRESET", "quality-beam")
+CHAT_DECODING_PRESET = os.environ.get("CHAT_DECODING_PRESET", "balanced")
+
+# The M2M100 model & tokenizer for translation
 model_name = "facebook/m2m100_418M"
-tokenizer = M2M100Tokenizer.from_pretrained(model_name)
-model = M2M100ForConditionalGeneration.from_pretrained(model_name)
+
+def load_translation_model():
+    tokenizer = M2M100Tokenizer.from_pretrained(model_name)
+    model = M2M100ForConditionalGeneration.from_pretrained(model_name)
+    # One tokenizer per source language, so no request ever mutates `src_lang`
+    return {"tokenizers": TokenizerPool(tokenizer, LANGUAGES.values()), "model": model}
+
+models.register("translation", load_translation_model)
+
+# Synthesized speech, stored once per (text, language, voice)
+audio_store = AudioStore(
+    app.static_folder,
+    url_prefix=app.static_url_path,
+    max_bytes=int(os.environ.get("TTS_CACHE_BYTES", 256 * 1024 * 1024)),
+)
+
+def synthesize_gtts(text, lang, filepath):
+    tts = gTTS(text=text, lang=lang)
+    tts.save(filepath)
+
+# Language identification for "auto", restricted to LANGUAGES and loaded once at startup.
+# Texts it can't tell with at least LANGID_THRESHOLD confidence are left to the user.
+language_id = LanguageIdentifier(
+    LANGUAGES.values(),
+    threshold=float(os.environ.get("LANGID_THRESHOLD", 0.8)),
+)
 
 @app.route('/', methods=['GET', 'POST'])
 def home():
@@ -46,34 +88,31 @@ def home():
             try:
                 # Detect language if user chose "auto"
                 if source_lang == 'auto':
-                    try:
-                        detected = detect(input_text)
-                        if detected not in LANGUAGES.values():
-                            raise ValueError(f"Detected language '{detected}' not supported.")
-                        source_lang = detected
-                    except LangDetectException:
+                    detected = language_id.detect(input_text)
+                    if detected is None:
                         error = "Could not detect the language. Please select manually."
-                        source_lang = 'auto'  # keep it
+                    else:
+                        source_lang = detected
 
                 if not error:
-                    # Set source language for tokenizer
-                    tokenizer.src_lang = source_lang
-                    encoded = tokenizer(input_text, return_tensors="pt")
+                    translation_model = models.get("translation")
+                    tokenizers = translation_model["tokenizers"]
+                    model = translation_model["model"]
+
+                    # Encode with the tokenizer pre-configured for the source language
+                    encoded = tokenizers.encode(input_text, source_lang, return_tensors="pt")
 
                     # Generate translation, specifying the target language
                     generated_tokens = model.generate(
                         **encoded,
-                        forced_bos_token_id=tokenizer.get_lang_id(target_lang)
+                        forced_bos_token_id=tokenizers.get_lang_id(target_lang),
+                        **TRANSLATION_PRESETS[DECODING_PRESET]
                     )
-                    translation = tokenizer.decode(generated_tokens[0], skip_special_tokens=True)
+                    translation = tokenizers.batch_decode(generated_tokens, skip_special_tokens=True)[0]
 
-                    # Generate TTS
+                    # Generate TTS (reusing the stored file for repeated translations)
                     if translation.strip():
-                        tts = gTTS(text=translation, lang=target_lang)
-                        filename = f"tts_{uuid.uuid4().hex}.mp3"
-                        filepath = os.path.join("static", filename)
-                        tts.save(filepath)
-                        mp3_url = f"/static/{filename}"
+                        mp3_url = audio_store.get_or_create(translation, target_lang, synthesize_gtts)
 
             except Exception as e:
                 error = f"Translation error: {str(e)}"
@@ -93,31 +132,61 @@ def home():
 #            CHAT ENDPOINT (Using DeepSeek Pipeline)            #
 ##################################################################
 
-# 1) Initialize the pipeline
-deepseek_pipe = pipeline(
-    "text-generation", 
-    model="deepseek-ai/DeepSeek-R1", 
-    trust_remote_code=True
+# 1) Register the pipeline (created the first time /chat is used)
+def load_chat_pipeline():
+    return pipeline(
+        "text-generation",
+        model="deepseek-ai/DeepSeek-R1",
+        trust_remote_code=True
+    )
+
+models.register("chat", load_chat_pipeline)
+
+# generate() kwargs for the pipeline (the streamer doesn't support beam search)
+chat_generate_kwargs = CHAT_PRESETS[CHAT_DECODING_PRESET]
+chat_stream_kwargs = dict(chat_generate_kwargs, num_beams=1)
+
+if os.environ.get("MODEL_WARMUP") == "1":
+    models.warmup()
+
+def count_chat_tokens(text):
+    return len(models.get("chat").tokenizer.encode(text))
+
+# Conversation history per browser session, trimmed to a token budget so the
+# prompt (and generation latency) stays bounded. CONVERSATION_DB shares it between workers.
+conversation_store = open_store(
+    count_chat_tokens,
+    db_path=os.environ.get("CONVERSATION_DB"),
+    max_tokens=int(os.environ.get("MAX_HISTORY_TOKENS", 1024)),
+    max_sessions=int(os.environ.get("MAX_SESSIONS", 1000)),
 )
 
-# We'll keep a very simple global in-memory conversation store
-conversation_history = []
+def conversation_id():
+    """The id of the current browser session's conversation."""
+    if "conversation_id" not in session:
+        session["conversation_id"] = uuid.uuid4().hex
+    return session["conversation_id"]
 
 @app.route('/chat', methods=['GET', 'POST'])
 def chat():
     """
     A simple chat endpoint using deepseek-ai/DeepSeek-R1 via pipeline.
     """
-    global conversation_history
     error = None
+    conv_id = conversation_id()
 
     if request.method == 'POST':
         user_prompt = request.form.get('prompt', '').strip()
         if not user_prompt:
             error = "Please enter a prompt."
         else:
-            # 1) Add user's message to conversation
-            conversation_history.append({"role": "user", "content": user_prompt})
+            try:
+                deepseek_pipe = models.get("chat")
+            except ModelNotEnabled as e:
+                return render_template("tikgpt.html", conversation=conversation_store.messages(conv_id), error=str(e))
+
+            # 1) Add user's message to conversation (old turns beyond the token budget are dropped)
+            conversation_store.append(conv_id, "user", user_prompt)
 
             # 2) Prepare messages for the pipeline
             #    The pipeline can accept a list of messages if the model supports it
@@ -129,7 +198,21 @@ def chat():
             #   {"role": "user", "content": "Who are you?"}
             # ]
             # Here, we simply pass in the entire conversation to let the model see the context:
-            output = deepseek_pipe(conversation_history)
+            messages = conversation_store.messages(conv_id)
+
+            # Streaming clients get the reply token by token (Server-Sent Events)
+            if wants_stream(request):
+                chunks = stream_generation(
+                    deepseek_pipe.tokenizer,
+                    lambda streamer: deepseek_pipe(messages, streamer=streamer, **chat_stream_kwargs)
+                )
+
+                def on_complete(reply):
+                    conversation_store.append(conv_id, "assistant", reply.strip())
+
+                return sse_response(sse_stream(chunks, on_complete))
+
+            output = deepseek_pipe(messages, **chat_generate_kwargs)
 
             # 3) The pipeline returns a list. The usual key is 'generated_text'
             if isinstance(output, list) and len(output) > 0:
@@ -138,12 +221,12 @@ def chat():
                 model_reply = "No response."
 
             # 4) Add the model's response to the conversation
-            conversation_history.append({"role": "assistant", "content": model_reply})
+            conversation_store.append(conv_id, "assistant", model_reply)
 
             return redirect(url_for('chat'))
 
     # Render the chat template with existing conversation
-    return render_template("tikgpt.html", conversation=conversation_history, error=error)
+    return render_template("tikgpt.html", conversation=conversation_store.messages(conv_id), error=error)
 
 ##################################################################
 #       OPTIONAL: An API endpoint if you still want one         #
@@ -153,8 +236,10 @@ def chat():
 def chatapi():
     """
     Endpoint that generates text using the pipeline for JSON requests.
-    Expects a JSON body: {"prompt": "..."}
+    Expects a JSON body: {"prompt": "...", "stream": false}
     Returns JSON: {"response": "... model output ..."}
+    With "stream": true (or Accept: text/event-stream) the reply is sent
+    as Server-Sent Events: {"token": "..."} per chunk, then {"done": true, "response": "..."}
     """
     data = request.get_json()
     prompt = data.get('prompt', '').strip()
@@ -162,9 +247,22 @@ def chatapi():
     if not prompt:
         return jsonify({"error": "No prompt provided"}), 400
 
+    try:
+        deepseek_pipe = models.get("chat")
+    except ModelNotEnabled as e:
+        return jsonify({"error": str(e)}), 503
+
     # We could just call the pipeline with the prompt:
     messages = [{"role": "user", "content": prompt}]
-    output = deepseek_pipe(messages)
+
+    if wants_stream(request):
+        chunks = stream_generation(
+            deepseek_pipe.tokenizer,
+            lambda streamer: deepseek_pipe(messages, streamer=streamer, **chat_stream_kwargs)
+        )
+        return sse_response(sse_stream(chunks))
+
+    output = deepseek_pipe(messages, **chat_generate_kwargs)
     if isinstance(output, list) and len(output) > 0:
         ai_reply = output[0].get('generated_text', '').strip()
     else:
@@ -174,7 +272,6 @@ def chatapi():
 
 
 if __name__ == '__main__':
-    # Make sure there's a 'static' folder to save MP3 files
-    if not os.path.exists("static"):
-        os.makedirs("static")
-    app.run(debug=True)
+    # gunicorn with gunicorn.conf.py (FLASK_DEBUG=1: Flask's development server), see serve.py
+    from serve import run
+    run(app, warmup=models.warmup)
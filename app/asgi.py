@@ -0,0 +1,270 @@
+"""
+Asyncio serving mode for the translation page and the chat endpoints.
+
+    cd app && uvicorn asgi:app --host 127.0.0.1 --port 8000
+    cd app && python asgi.py --workers 2  (gunicorn with uvicorn workers, see serve.py)
+
+`/`, `/chat` and `/api-chat` are served by async handlers: a request waiting
+for its translation awaits the micro-batcher's futures, and chat generations
+run on a bounded pool of ASGI_INFERENCE_THREADS threads, so open connections
+(e.g. streaming chats waiting for their turn) don't each hold an OS thread.
+Cache, conversation store and audio marker I/O (SQLite, files) runs on
+ASGI_IO_THREADS threads, so a busy database never stalls the event loop.
+Every other route is served by the Flask app in main.py.
+"""
+import asyncio
+import os
+import threading
+import uuid
+from concurrent.futures import ThreadPoolExecutor
+
+from a2wsgi import WSGIMiddleware
+from starlette.applications import Starlette
+from starlette.middleware import Middleware
+from starlette.middleware.sessions import SessionMiddleware
+from starlette.responses import JSONResponse, RedirectResponse, StreamingResponse
+from starlette.routing import Mount, Route
+from starlette.templating import Jinja2Templates
+
+import main
+from decoding import TRANSLATION_PRESETS, parse_budget
+from inference_client import InferenceError
+from model_registry import ModelNotEnabled
+from streaming import sse_event
+from translator import LANGUAGES
+
+templates = Jinja2Templates(directory=os.path.join(os.path.dirname(os.path.abspath(__file__)), "templates"))
+
+# Chat generations (and the conversation store, which counts tokens with the
+# chat tokenizer) run here; requests beyond this many wait without a thread
+inference_executor = ThreadPoolExecutor(
+    int(os.environ.get("ASGI_INFERENCE_THREADS", 4)), thread_name_prefix="asgi-inference"
+)
+
+
+# Short blocking I/O: translation cache and conversation store lookups, speech state files
+io_executor = ThreadPoolExecutor(int(os.environ.get("ASGI_IO_THREADS", 8)), thread_name_prefix="asgi-io")
+
+
+async def run_blocking(func, *args):
+    """Run a blocking call on the inference pool."""
+    return await asyncio.get_running_loop().run_in_executor(inference_executor, func, *args)
+
+
+async def run_io(func, *args):
+    """Run a short blocking I/O call (SQLite, files) on the I/O pool."""
+    return await asyncio.get_running_loop().run_in_executor(io_executor, func, *args)
+
+
+async def iterate_blocking(start):
+    """Iterate the blocking generator returned by start() on the inference pool, yielding its items here."""
+    loop = asyncio.get_running_loop()
+    queue = asyncio.Queue()
+    stopped = threading.Event()
+
+    def produce():
+        try:
+            chunks = start()
+            for chunk in chunks:
+                loop.call_soon_threadsafe(queue.put_nowait, ("chunk", chunk))
+                if stopped.is_set():
+                    # The client went away: stop generating
+                    chunks.close()
+                    return
+        except Exception as e:
+            loop.call_soon_threadsafe(queue.put_nowait, ("error", e))
+        else:
+            loop.call_soon_threadsafe(queue.put_nowait, ("done", None))
+
+    loop.run_in_executor(inference_executor, produce)
+    try:
+        while True:
+            kind, payload = await queue.get()
+            if kind == "error":
+                raise payload
+            if kind == "done":
+                return
+            yield payload
+    finally:
+        stopped.set()
+
+
+async def sse_stream(chunks, on_complete=None):
+    """Async version of streaming.sse_stream: SSE events for the text chunks of an async iterator."""
+    parts = []
+    try:
+        async for chunk in chunks:
+            parts.append(chunk)
+            yield sse_event({"token": chunk})
+    except Exception as e:
+        yield sse_event({"error": str(e)})
+        return
+    text = "".join(parts)
+    if on_complete is not None:
+        await on_complete(text)
+    yield sse_event({"done": True, "response": text})
+
+
+def sse_response(events):
+    return StreamingResponse(
+        events, media_type="text/event-stream", headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"}
+    )
+
+
+def wants_stream(request, data):
+    """True if the client asked for a streamed response (see streaming.wants_stream)."""
+    if request.headers.get("accept", "").split(",")[0].strip() == "text/event-stream":
+        return True
+    return bool(data.get("stream"))
+
+
+async def home(request):
+    translation = ""
+    error = ""
+    source_lang = 'auto'
+    target_lang = 'en'
+    input_text = ""
+    mp3_url = None
+    mp3_status = None
+    preset = main.DECODING_PRESET
+    mode = None
+
+    if request.method == 'POST':
+        form = await request.form()
+        input_text = form.get('text', '')
+        source_lang = form.get('source_lang', 'auto')
+        target_lang = form.get('target_lang', 'en')
+        preset = form.get('preset') or main.DECODING_PRESET
+
+        if input_text.strip():
+            try:
+                # Cache lookups and writes run on the I/O pool
+                finish, futures = await run_io(
+                    main.start_translation,
+                    input_text, source_lang, target_lang, preset, parse_budget(form.get('latency_budget_ms'))
+                )
+                # Wait for the batcher without holding a thread. Shielded: if this
+                # request is cancelled, the batcher's futures are left to finish
+                await asyncio.gather(*(asyncio.shield(asyncio.wrap_future(future)) for future in futures))
+                translation, source_lang, mode = await run_io(finish)
+
+                if translation.strip():
+                    mp3_url, mp3_status = await run_io(main.speech.request, translation, target_lang)
+
+            except ValueError as e:
+                error = str(e)
+            except Exception as e:
+                error = f"Translation error: {str(e)}"
+
+    response = templates.TemplateResponse(request, 'index.html', {
+        "translation": translation,
+        "error": error,
+        "languages": LANGUAGES,
+        "source_lang": source_lang,
+        "target_lang": target_lang,
+        "input_text": input_text,
+        "mp3_url": mp3_url,
+        "mp3_status": mp3_status,
+        "presets": TRANSLATION_PRESETS,
+        "preset": preset,
+        "mode": mode,
+    })
+    if mode is not None:
+        response.headers["X-Serving-Mode"] = mode
+    return response
+
+
+def conversation_id(request):
+    """The id of the browser session's conversation (see main.conversation_id)."""
+    if "conversation_id" not in request.session:
+        request.session["conversation_id"] = uuid.uuid4().hex
+    return request.session["conversation_id"]
+
+
+async def chat(request):
+    error = None
+    conv_id = conversation_id(request)
+    store = main.conversation_store
+
+    if request.method == 'POST':
+        form = await request.form()
+        user_prompt = form.get('prompt', '').strip()
+        if not user_prompt:
+            error = "Please enter a prompt."
+        else:
+            streaming = wants_stream(request, {"stream": form.get("stream") == "1"})
+            try:
+                decoding = main.chat_decoding(form.get('preset'), parse_budget(form.get('latency_budget_ms')), streaming)
+                await run_blocking(store.append, conv_id, "user", user_prompt)
+                full_context = await run_blocking(main.chat_prompt, conv_id)
+            except (ValueError, ModelNotEnabled, InferenceError) as e:
+                return templates.TemplateResponse(
+                    request, "tikgpt.html", {"conversation": await run_io(store.messages, conv_id), "error": str(e)}
+                )
+
+            if streaming:
+                async def on_complete(answer):
+                    await run_blocking(store.append, conv_id, "assistant", answer.strip())
+
+                chunks = iterate_blocking(lambda: main.inference.stream_text(full_context, decoding, conv_id))
+                return sse_response(sse_stream(chunks, on_complete))
+
+            generated_text = await run_blocking(main.inference.generate_text, full_context, decoding, conv_id)
+            answer = generated_text.split("AI:")[-1].strip()
+            await run_blocking(store.append, conv_id, "assistant", answer)
+
+            return RedirectResponse("/chat", status_code=303)
+
+    conversation = await run_io(store.messages, conv_id)
+    return templates.TemplateResponse(request, "tikgpt.html", {"conversation": conversation, "error": error})
+
+
+async def chatapi(request):
+    """Same contract as main.chatapi."""
+    try:
+        data = await request.json()
+    except ValueError:
+        data = None
+    if not isinstance(data, dict):
+        return JSONResponse({"error": "Expected a JSON body"}, status_code=400)
+    prompt = data.get('prompt', '').strip()
+    if not prompt:
+        return JSONResponse({"error": "No prompt provided"}, status_code=400)
+
+    streaming = wants_stream(request, data)
+    try:
+        decoding = main.chat_decoding(data.get('preset'), parse_budget(data.get('latency_budget_ms')), streaming)
+    except ValueError as e:
+        return JSONResponse({"error": str(e)}, status_code=400)
+
+    if streaming:
+        try:
+            # Loads the model (or fails) up front, so errors get a status code
+            chunks = await run_blocking(main.inference.stream_text, prompt, decoding)
+        except (ModelNotEnabled, InferenceError) as e:
+            return JSONResponse({"error": str(e)}, status_code=503)
+        return sse_response(sse_stream(iterate_blocking(lambda: chunks)))
+
+    try:
+        generated_text = await run_blocking(main.inference.generate_text, prompt, decoding)
+    except (ModelNotEnabled, InferenceError) as e:
+        return JSONResponse({"error": str(e)}, status_code=503)
+    return JSONResponse({"response": generated_text})
+
+
+app = Starlette(
+    routes=[
+        Route("/", home, methods=["GET", "POST"]),
+        Route("/chat", chat, methods=["GET", "POST"]),
+        Route("/api-chat", chatapi, methods=["POST"]),
+        # Everything else (the JSON API, jobs, speech status, stats, static files)
+        Mount("/", app=WSGIMiddleware(main.app)),
+    ],
+    # A separate cookie from Flask's: the two apps sign their sessions differently
+    middleware=[Middleware(SessionMiddleware, secret_key=main.app.secret_key, session_cookie="asgi_session")],
+)
+
+
+if __name__ == "__main__":
+    from serve import run
+    run(app, warmup=None if main.INFERENCE_SOCKET else main.models.warmup, worker_class="uvicorn.workers.UvicornWorker")
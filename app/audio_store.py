@@ -0,0 +1,155 @@
+import glob
+import hashlib
+import os
+import threading
+import time
+
+# Marker files next to the audio, so every worker sees the state of a synthesis
+STATES = ("pending", "failed")
+
+
+class AudioStore:
+    """
+    Content-hashed store for synthesized speech.
+
+    The file name is derived from a hash of (text, lang, voice), so identical
+    requests reuse the audio file already on disk instead of calling the TTS
+    backend again. The directory is kept under `max_bytes` by deleting the least
+    recently used `tts_*` files (access time is tracked through mtime, so
+    it is shared by every worker using the same directory). Syntheses in
+    progress or failed are recorded there as well (see set_state).
+    """
+
+    def __init__(self, directory, url_prefix="/static", max_bytes=256 * 1024 * 1024,
+                 voice="gtts", extension="mp3"):
+        self.directory = directory
+        self.url_prefix = url_prefix.rstrip("/")
+        self.max_bytes = max_bytes
+        self.voice = voice
+        self.extension = extension
+        self._lock = threading.Lock()
+        self._key_locks = {}
+        self.hits = 0
+        self.misses = 0
+        os.makedirs(directory, exist_ok=True)
+
+    def filename_for(self, text, lang, voice=None):
+        raw = "\x1f".join([voice or self.voice, lang, text])
+        return f"tts_{hashlib.sha256(raw.encode('utf-8')).hexdigest()[:32]}.{self.extension}"
+
+    def url_for(self, filename):
+        return f"{self.url_prefix}/{filename}"
+
+    def _key_lock(self, filename):
+        with self._lock:
+            return self._key_locks.setdefault(filename, threading.Lock())
+
+    def lookup(self, text, lang, voice=None, count_hit=False):
+        """Return the URL of an existing file (marking it as used) or None."""
+        filename = self.filename_for(text, lang, voice)
+        filepath = os.path.join(self.directory, filename)
+        try:
+            os.utime(filepath)
+        except FileNotFoundError:
+            return None
+        if count_hit:
+            with self._lock:
+                self.hits += 1
+        return self.url_for(filename)
+
+    def get_or_create(self, text, lang, synthesize, voice=None):
+        """
+        Return the URL for (text, lang, voice), calling
+        `synthesize(text, lang, filepath)` only when it is not on disk yet.
+        """
+        filename = self.filename_for(text, lang, voice)
+        filepath = os.path.join(self.directory, filename)
+
+        with self._key_lock(filename):
+            url = self.lookup(text, lang, voice, count_hit=True)
+            if url is not None:
+                return url
+
+            # Write to a temporary name first so other workers never serve
+            # a half-written file
+            tmp_path = f"{filepath}.{os.getpid()}.{threading.get_ident()}.tmp"
+            try:
+                synthesize(text, lang, tmp_path)
+                os.replace(tmp_path, filepath)
+            finally:
+                if os.path.exists(tmp_path):
+                    os.remove(tmp_path)
+
+        with self._lock:
+            self.misses += 1
+            self._key_locks.pop(filename, None)
+        self.enforce_quota()
+        return self.url_for(filename)
+
+    def _marker(self, filename, state):
+        return os.path.join(self.directory, f"{filename}.{state}")
+
+    def set_state(self, filename, state=None):
+        """Record that `filename` is being synthesized ('pending') or 'failed'; None clears the state."""
+        for other in STATES:
+            if other != state:
+                try:
+                    os.remove(self._marker(filename, other))
+                except FileNotFoundError:
+                    pass
+        if state is not None:
+            with open(self._marker(filename, state), "w"):
+                pass
+
+    def state(self, filename, pending_timeout=300):
+        """
+        'ready', 'pending', 'failed' or 'missing' for `filename`, as recorded
+        by any worker. A 'pending' marker older than `pending_timeout` seconds
+        (left by a worker that died while synthesizing) counts as 'failed'.
+        """
+        if os.path.exists(os.path.join(self.directory, filename)):
+            return "ready"
+        try:
+            started = os.stat(self._marker(filename, "pending")).st_mtime
+            return "pending" if time.time() - started < pending_timeout else "failed"
+        except FileNotFoundError:
+            pass
+        return "failed" if os.path.exists(self._marker(filename, "failed")) else "missing"
+
+    def _files(self):
+        files = []
+        for path in glob.glob(os.path.join(self.directory, "tts_*")):
+            if path.endswith((".tmp",) + tuple(f".{state}" for state in STATES)):
+                continue
+            try:
+                st = os.stat(path)
+            except FileNotFoundError:
+                continue
+            files.append((st.st_mtime, st.st_size, path))
+        return files
+
+    def enforce_quota(self):
+        """Delete least recently used files until the store fits in `max_bytes`."""
+        files = self._files()
+        total = sum(size for _, size, _ in files)
+        for _, size, path in sorted(files):
+            if total <= self.max_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+        return total
+
+    def stats(self):
+        files = self._files()
+        lookups = self.hits + self.misses
+        return {
+            "files": len(files),
+            "bytes": sum(size for _, size, _ in files),
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "hit_rate": (self.hits / lookups) if lookups else 0.0,
+        }
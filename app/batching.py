@@ -0,0 +1,119 @@
+import queue
+import threading
+import time
+from collections import OrderedDict
+from concurrent.futures import Future, InvalidStateError
+
+from fork_safe import ForkGuard
+
+
+def _resolve(future, result=None, exception=None):
+    """Set a future's outcome; a future that is already done is left alone."""
+    try:
+        if exception is not None:
+            future.set_exception(exception)
+        else:
+            future.set_result(result)
+    except InvalidStateError:
+        pass
+
+
+class MicroBatcher:
+    """
+    Collects translation requests coming from many request threads and runs
+    them as padded batches on a single background thread.
+
+    Requests are grouped by key (e.g. (source_lang, target_lang)) because the
+    forced BOS token differs per target language, so every group becomes one
+    `translate_fn(texts, *key)` call. The results are routed back to the
+    waiting threads through a Future.
+    """
+
+    def __init__(self, translate_fn, max_batch_size=16, max_wait_ms=20):
+        self.translate_fn = translate_fn
+        self.max_batch_size = max_batch_size
+        self.max_wait = max_wait_ms / 1000.0
+        self._queue = queue.Queue()
+        self._lock = threading.Lock()
+        self._thread = None
+        self._process = ForkGuard()
+        self._batches = 0
+        self._items = 0
+
+    def _ensure_worker(self):
+        # Started lazily (and again if it died), see fork_safe.py
+        with self._lock:
+            if self._process.new_process():
+                # Items queued in the parent belong to its threads
+                self._queue = queue.Queue()
+            elif self._thread is not None and self._thread.is_alive():
+                return
+            self._thread = threading.Thread(target=self._run, name="micro-batcher", daemon=True)
+            self._thread.start()
+
+    def submit(self, text, *key):
+        """Queue a single text and return a Future with its translation."""
+        self._ensure_worker()
+        future = Future()
+        self._queue.put((key, text, future))
+        return future
+
+    def translate(self, text, *key, timeout=None):
+        """Blocking helper: submit a text and wait for its translation."""
+        return self.submit(text, *key).result(timeout=timeout)
+
+    def pending(self):
+        """Number of items waiting to be picked up by the worker."""
+        return self._queue.qsize()
+
+    def stats(self):
+        batches = self._batches
+        return {
+            "batches": batches,
+            "items": self._items,
+            "avg_batch_size": (self._items / batches) if batches else 0.0,
+            "pending": self.pending(),
+        }
+
+    def _collect(self):
+        # Block for the first item, then keep collecting until the window
+        # closes or the batch is full.
+        batch = [self._queue.get()]
+        deadline = time.monotonic() + self.max_wait
+        while len(batch) < self.max_batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _run(self):
+        while True:
+            batch = self._collect()
+
+            # Group by key, keeping arrival order inside each group. Futures
+            # cancelled while queued (e.g. by a client that went away) are skipped;
+            # the others can't be cancelled any more.
+            groups = OrderedDict()
+            for key, text, future in batch:
+                if future.set_running_or_notify_cancel():
+                    groups.setdefault(key, []).append((text, future))
+
+            for key, items in groups.items():
+                texts = [text for text, _ in items]
+                try:
+                    results = self.translate_fn(texts, *key)
+                    if len(results) != len(texts):
+                        # Results can't be matched to their texts: fail the whole group
+                        raise RuntimeError(f"translate_fn returned {len(results)} results for {len(texts)} texts")
+                except Exception as e:
+                    for _, future in items:
+                        _resolve(future, exception=e)
+                    continue
+                for (_, future), result in zip(items, results):
+                    _resolve(future, result)
+                self._batches += 1
+                self._items += len(items)
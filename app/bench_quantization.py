@@ -0,0 +1,127 @@
+"""
+Quality / latency comparison of the quantized inference modes.
+
+Runs a fixed sample set through the fp32 model and through each quantized
+mode, then reports average latency, serialized weight size and a BLEU-style
+n-gram overlap of every mode's outputs against the fp32 outputs.
+
+    cd app && python bench_quantization.py --model m2m100 --modes int8 bf16
+    cd app && python bench_quantization.py --model gpt2 --modes int8
+"""
+import argparse
+import math
+import time
+from collections import Counter
+
+import torch
+from transformers import GPT2LMHeadModel, GPT2Tokenizer, M2M100ForConditionalGeneration, M2M100Tokenizer
+
+from quantization import quantize, serialized_bytes
+
+# (text, source_lang, target_lang)
+TRANSLATION_SAMPLES = [
+    ("Hello, how are you?", "en", "pt"),
+    ("The weather is beautiful today, let's go to the beach!", "en", "fr"),
+    ("This video has over a million views already.", "en", "es"),
+    ("Follow me for more daily tips about cooking.", "en", "de"),
+    ("Je ne sais pas ce que tu veux dire.", "fr", "en"),
+    ("¿Dónde está la estación de tren más cercana?", "es", "en"),
+    ("Obrigado por assistir, até amanhã!", "pt", "en"),
+    ("Das ist der beste Kaffee der Stadt.", "de", "it"),
+]
+
+PROMPTS = [
+    "The future of AI in World is",
+    "Translate to Portuguese: Hello, how are you?",
+    "Once upon a time, in a small village,",
+    "The three most important things about machine learning are",
+]
+
+
+def bleu(hypothesis, reference, max_n=4):
+    """Sentence-level BLEU (with add-one smoothing) on whitespace tokens, 0-100."""
+    hyp, ref = hypothesis.split(), reference.split()
+    if not hyp or not ref:
+        return 100.0 if hyp == ref else 0.0
+    log_precision = 0.0
+    for n in range(1, max_n + 1):
+        hyp_ngrams = Counter(tuple(hyp[i:i + n]) for i in range(len(hyp) - n + 1))
+        ref_ngrams = Counter(tuple(ref[i:i + n]) for i in range(len(ref) - n + 1))
+        overlap = sum((hyp_ngrams & ref_ngrams).values())
+        total = sum(hyp_ngrams.values())
+        log_precision += math.log((overlap + 1) / (total + 1)) / max_n
+    brevity = min(1.0, math.exp(1 - len(ref) / len(hyp)))
+    return 100 * brevity * math.exp(log_precision)
+
+
+def load_m2m100(mode):
+    name = "facebook/m2m100_418M"
+    tokenizer = M2M100Tokenizer.from_pretrained(name)
+    model = quantize(M2M100ForConditionalGeneration.from_pretrained(name), mode)
+
+    def run(sample):
+        text, source_lang, target_lang = sample
+        tokenizer.src_lang = source_lang
+        encoded = tokenizer(text, return_tensors="pt")
+        generated = model.generate(**encoded, forced_bos_token_id=tokenizer.get_lang_id(target_lang))
+        return tokenizer.decode(generated[0], skip_special_tokens=True)
+
+    return model, run, TRANSLATION_SAMPLES
+
+
+def load_gpt2(mode, name="gpt2"):
+    tokenizer = GPT2Tokenizer.from_pretrained(name)
+    model = quantize(GPT2LMHeadModel.from_pretrained(name), mode)
+
+    def run(prompt):
+        input_ids = tokenizer.encode(prompt, return_tensors="pt")
+        # Greedy decoding, so the outputs can be compared between modes
+        output = model.generate(input_ids, max_new_tokens=40, do_sample=False,
+                                pad_token_id=tokenizer.eos_token_id)
+        return tokenizer.decode(output[0][input_ids.shape[1]:], skip_special_tokens=True)
+
+    return model, run, PROMPTS
+
+
+LOADERS = {
+    "m2m100": load_m2m100,
+    "gpt2": load_gpt2,
+    "gpt2-medium": lambda mode: load_gpt2(mode, "gpt2-medium"),
+}
+
+
+def measure(loader, mode, runs):
+    model, run, samples = loader(mode)
+    run(samples[0])  # warmup
+    outputs, timings = [], []
+    with torch.inference_mode():
+        for sample in samples:
+            start = time.perf_counter()
+            for _ in range(runs):
+                output = run(sample)
+            timings.append((time.perf_counter() - start) / runs)
+            outputs.append(output)
+    return outputs, sum(timings) / len(timings), serialized_bytes(model)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--model", choices=sorted(LOADERS), default="m2m100")
+    parser.add_argument("--modes", nargs="+", default=["int8", "bf16"])
+    parser.add_argument("--runs", type=int, default=3, help="repetitions per sample")
+    args = parser.parse_args()
+
+    loader = LOADERS[args.model]
+    reference, base_latency, base_size = measure(loader, "fp32", args.runs)
+
+    print(f"{'mode':>6} {'latency ms':>11} {'speedup':>8} {'size MB':>9} {'size x':>7} {'BLEU vs fp32':>13}")
+    print(f"{'fp32':>6} {base_latency * 1000:>11.1f} {1.0:>8.2f} {base_size / 2**20:>9.1f} {1.0:>7.2f} {100.0:>13.1f}")
+    for mode in args.modes:
+        outputs, latency, size = measure(loader, mode, args.runs)
+        score = sum(bleu(out, ref) for out, ref in zip(outputs, reference)) / len(reference)
+        print(f"{mode:>6} {latency * 1000:>11.1f} {base_latency / latency:>8.2f} "
+              f"{size / 2**20:>9.1f} {base_size / size:>7.2f} {score:>13.1f}")
+
+
+if __name__ == "__main__":
+    main()
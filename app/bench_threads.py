@@ -0,0 +1,102 @@
+"""
+Find the best gunicorn workers x torch threads combination for this host.
+
+Starts gunicorn (gunicorn.conf.py) once per combination, with WEB_CONCURRENCY
+workers and TORCH_THREADS intra-op threads per worker (pinned to their cores,
+see thread_plan.py), sends the same translation load to each and reports
+throughput and latency. Every request has a text of its own, so the
+translation cache doesn't help.
+
+    cd app && python bench_threads.py --requests 64 --concurrency 16
+    cd app && python bench_threads.py --workers 1 2 4 --threads 1 2 4
+"""
+import argparse
+import json
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+from bench_worker_rss import wait_ready
+from thread_plan import available_cpus
+
+SENTENCES = [
+    "The weather is beautiful today, let's go to the beach number {i}!",
+    "This is video {i} of the series, thanks for watching.",
+    "Follow me for more daily tips about cooking, day {i}.",
+    "Order {i} will be delivered tomorrow morning.",
+]
+
+
+def translate(url, i):
+    body = json.dumps({"items": [{"text": SENTENCES[i % len(SENTENCES)].format(i=i),
+                                  "source_lang": "en", "target_lang": "fr"}]}).encode()
+    request = urllib.request.Request(url, data=body, headers={"Content-Type": "application/json"})
+    start = time.perf_counter()
+    urllib.request.urlopen(request, timeout=600).read()
+    return time.perf_counter() - start
+
+
+def percentile(values, fraction):
+    values = sorted(values)
+    return values[min(len(values) - 1, int(len(values) * fraction))]
+
+
+def run(workers, threads, args):
+    env = dict(os.environ,
+               PRELOAD_MODELS="1",
+               ENABLED_MODELS="translation",
+               WEB_CONCURRENCY=str(workers),
+               TORCH_THREADS=str(threads),
+               BIND=f"127.0.0.1:{args.port}",
+               WORKER_TIMEOUT=str(args.timeout))
+    master = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app"], env=env,
+                              stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+    url = f"http://127.0.0.1:{args.port}/api/translate"
+    try:
+        wait_ready(f"http://127.0.0.1:{args.port}/stats", args.timeout)
+        # Warm every worker up (first generate() calls are slower)
+        with ThreadPoolExecutor(args.concurrency) as pool:
+            warmup = workers * 2
+            list(pool.map(lambda i: translate(url, i), range(warmup)))
+            start = time.perf_counter()
+            latencies = list(pool.map(lambda i: translate(url, i), range(warmup, warmup + args.requests)))
+            elapsed = time.perf_counter() - start
+        return args.requests / elapsed, percentile(latencies, 0.5), percentile(latencies, 0.95)
+    finally:
+        master.terminate()
+        master.wait()
+
+
+def main():
+    cpus = len(available_cpus())
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, nargs="+", default=None, help="worker counts (default: 1, 2, 4, ... up to the CPUs)")
+    parser.add_argument("--threads", type=int, nargs="+", default=None, help="torch threads per worker (default: 1, 2, 4, ... up to the CPUs)")
+    parser.add_argument("--oversubscribe", action="store_true", help="also run combinations using more threads than CPUs")
+    parser.add_argument("--requests", type=int, default=64)
+    parser.add_argument("--concurrency", type=int, default=16)
+    parser.add_argument("--port", type=int, default=8766)
+    parser.add_argument("--timeout", type=int, default=900, help="seconds to wait for the workers to boot")
+    args = parser.parse_args()
+
+    counts = [n for n in (2 ** i for i in range(cpus.bit_length())) if n <= cpus]
+    combinations = [(workers, threads) for workers in args.workers or counts for threads in args.threads or counts
+                    if args.oversubscribe or workers * threads <= cpus]
+
+    print(f"{cpus} CPUs, {args.requests} requests, {args.concurrency} concurrent")
+    print(f"{'workers':>8} {'threads':>8} {'req/s':>8} {'p50 s':>8} {'p95 s':>8}")
+    results = []
+    for workers, threads in combinations:
+        throughput, p50, p95 = run(workers, threads, args)
+        results.append((throughput, workers, threads))
+        print(f"{workers:>8} {threads:>8} {throughput:>8.2f} {p50:>8.2f} {p95:>8.2f}", flush=True)
+
+    throughput, workers, threads = max(results)
+    print(f"\nBest: WEB_CONCURRENCY={workers} TORCH_THREADS={threads} ({throughput:.2f} req/s)")
+
+
+if __name__ == "__main__":
+    main()
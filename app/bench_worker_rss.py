@@ -0,0 +1,87 @@
+"""
+Compare per-worker memory with and without model preloading.
+
+Starts gunicorn (gunicorn.conf.py) twice, once with PRELOAD_MODELS=0 and
+once with PRELOAD_MODELS=1, waits until the workers answer, and prints
+RSS, PSS and shared memory for each worker.
+
+    cd app && python bench_worker_rss.py --workers 4
+"""
+import argparse
+import os
+import subprocess
+import sys
+import time
+import urllib.request
+
+
+def children(pid):
+    path = f"/proc/{pid}/task/{pid}/children"
+    with open(path) as f:
+        return [int(child) for child in f.read().split()]
+
+
+def memory(pid):
+    """RSS, PSS and shared (clean + dirty) memory in bytes, from smaps_rollup."""
+    values = {}
+    with open(f"/proc/{pid}/smaps_rollup") as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 3 and parts[2] == "kB":
+                values[parts[0].rstrip(":")] = int(parts[1]) * 1024
+    shared = values.get("Shared_Clean", 0) + values.get("Shared_Dirty", 0)
+    return values.get("Rss", 0), values.get("Pss", 0), shared
+
+
+def wait_ready(url, timeout):
+    deadline = time.time() + timeout
+    while time.time() < deadline:
+        try:
+            urllib.request.urlopen(url, timeout=5).read()
+            return
+        except OSError:
+            time.sleep(1)
+    raise TimeoutError(f"{url} did not answer within {timeout}s")
+
+
+def run(preload, workers, port, timeout):
+    env = dict(os.environ,
+               PRELOAD_MODELS="1" if preload else "0",
+               MODEL_WARMUP="1",
+               WEB_CONCURRENCY=str(workers),
+               BIND=f"127.0.0.1:{port}",
+               WORKER_TIMEOUT=str(timeout))
+    master = subprocess.Popen([sys.executable, "-m", "gunicorn", "-c", "gunicorn.conf.py", "main:app"], env=env)
+    try:
+        start = time.time()
+        wait_ready(f"http://127.0.0.1:{port}/stats", timeout)
+        # Give the remaining workers time to finish booting
+        while len(children(master.pid)) < workers:
+            time.sleep(1)
+        ready_seconds = time.time() - start
+        return ready_seconds, [memory(pid) for pid in children(master.pid)]
+    finally:
+        master.terminate()
+        master.wait()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--port", type=int, default=8765)
+    parser.add_argument("--timeout", type=int, default=900, help="seconds to wait for the workers to boot")
+    args = parser.parse_args()
+
+    mb = 1024 * 1024
+    for preload in (False, True):
+        ready_seconds, workers = run(preload, args.workers, args.port, args.timeout)
+        print(f"\npreload={'on' if preload else 'off'}  workers={len(workers)}  ready in {ready_seconds:.1f}s")
+        print(f"{'worker':>8} {'RSS MB':>10} {'PSS MB':>10} {'shared MB':>10}")
+        for i, (rss, pss, shared) in enumerate(workers):
+            print(f"{i:>8} {rss / mb:>10.1f} {pss / mb:>10.1f} {shared / mb:>10.1f}")
+        total_pss = sum(pss for _, pss, _ in workers)
+        print(f"{'total':>8} {'':>10} {total_pss / mb:>10.1f}")
+
+
+if __name__ == "__main__":
+    main()
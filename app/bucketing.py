@@ -0,0 +1,62 @@
+import threading
+
+
+def length_buckets(lengths, max_batch_size, max_ratio=2.0):
+    """
+    Split item indices into batches of similar length.
+
+    Indices are sorted by length and cut into consecutive buckets of at most
+    `max_batch_size` items; a new bucket is also started when an item is more
+    than `max_ratio` times longer than the shortest one in the current bucket,
+    which bounds the padding of every batch.
+    """
+    order = sorted(range(len(lengths)), key=lengths.__getitem__)
+    buckets, current = [], []
+    for i in order:
+        if current and (len(current) >= max_batch_size or lengths[i] > max_ratio * max(lengths[current[0]], 1)):
+            buckets.append(current)
+            current = []
+        current.append(i)
+    if current:
+        buckets.append(current)
+    return buckets
+
+
+class PaddingStats:
+    """Counts real vs. padded tokens of the batches sent to the model."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self.batches = 0
+        self.real_tokens = 0
+        self.padded_tokens = 0
+        self.last_ratio = 0.0
+
+    def record(self, lengths):
+        """Record one padded batch given the unpadded lengths of its items."""
+        real = sum(lengths)
+        padded = max(lengths) * len(lengths) if lengths else 0
+        with self._lock:
+            self.batches += 1
+            self.real_tokens += real
+            self.padded_tokens += padded
+            self.last_ratio = 1 - real / padded if padded else 0.0
+        return self.last_ratio
+
+    def merge(self, other):
+        """Add the counters of another PaddingStats (or of its `stats()` dict)."""
+        if isinstance(other, PaddingStats):
+            other = other.stats()
+        with self._lock:
+            self.batches += other["batches"]
+            self.real_tokens += other["real_tokens"]
+            self.padded_tokens += other["padded_tokens"]
+
+    def stats(self):
+        return {
+            "batches": self.batches,
+            "real_tokens": self.real_tokens,
+            "padded_tokens": self.padded_tokens,
+            "padding_ratio": (1 - self.real_tokens / self.padded_tokens) if self.padded_tokens else 0.0,
+            "last_padding_ratio": self.last_ratio,
+        }
@@ -0,0 +1,279 @@
+"""
+Offline bulk translation with the same M2M100 setup as the web app.
+
+Reads a JSONL or CSV file as a stream (fields: text, source_lang,
+target_lang and an optional id), sends chunks of records to a pool of
+worker processes that batch them by language pair and length, and writes
+the results incrementally, in input order. Progress is checkpointed, so an
+interrupted run continues where it stopped when started again.
+
+    cd app && python bulk_translate.py captions.jsonl translated.jsonl --target-lang pt
+    cd app && python bulk_translate.py captions.csv translated.csv --workers 4 --threads 2
+"""
+import argparse
+import csv
+import json
+import os
+import resource
+import sys
+import time
+from collections import OrderedDict
+from concurrent.futures import FIRST_COMPLETED, ProcessPoolExecutor, wait
+
+from bucketing import PaddingStats
+from decoding import TRANSLATION_PRESETS
+from language_id import LanguageIdentifier
+from segmentation import join_sentences, split_sentences
+from translator import LANGUAGES, load_translation_model, translate_batch
+
+OUTPUT_FIELDS = ["id", "text", "source_lang", "target_lang", "translation", "error"]
+
+# Set in every worker process by init_worker()
+_translation_model = None
+_language_id = None
+
+
+def read_records(path, source_lang, target_lang):
+    """Yield records from a JSONL or CSV file without loading it into memory."""
+    with open(path, newline="", encoding="utf-8") as f:
+        if path.endswith(".csv"):
+            rows = csv.DictReader(f)
+        else:
+            rows = (json.loads(line) for line in f if line.strip())
+        for i, row in enumerate(rows):
+            yield {
+                "id": row.get("id", i),
+                "text": row.get("text") or "",
+                "source_lang": row.get("source_lang") or source_lang,
+                "target_lang": row.get("target_lang") or target_lang,
+            }
+
+
+def chunks(records, size):
+    chunk = []
+    for record in records:
+        chunk.append(record)
+        if len(chunk) == size:
+            yield chunk
+            chunk = []
+    if chunk:
+        yield chunk
+
+
+def init_worker(quantization, threads, langid_threshold):
+    global _translation_model, _language_id
+    import torch
+
+    torch.set_num_threads(threads)
+    _translation_model = load_translation_model(quantization)
+    _language_id = LanguageIdentifier(LANGUAGES.values(), threshold=langid_threshold)
+
+
+def translate_records(records, source_lang, target_lang, batch_size, max_chars, padding_stats, generate_kwargs):
+    """
+    Translate records of one language pair in one translate_batch call. Like
+    the web app, every text is split into sentences of at most `max_chars`
+    characters (long texts exceed the model's positions) and put back together.
+    Returns the number of sentences translated.
+    """
+    segments = [split_sentences(record["text"], max_chars) for record in records]
+    # Bucketed by token length inside translate_batch, so padding stays low
+    translations = iter(translate_batch(
+        _translation_model, [sentence for parts in segments for sentence, _ in parts], source_lang, target_lang,
+        max_batch_size=batch_size, padding_stats=padding_stats, generate_kwargs=generate_kwargs
+    ))
+    for record, parts in zip(records, segments):
+        record["translation"] = join_sentences(
+            [next(translations) for _ in parts], [separator for _, separator in parts], target_lang
+        )
+    return sum(len(parts) for parts in segments)
+
+
+def translate_chunk(records, batch_size, generate_kwargs=None, max_chars=400):
+    """
+    Worker: translate one chunk of records, batched by language pair and length.
+    Returns the records, the padding counters of the batches it ran and the
+    number of sentences it translated.
+    """
+    # Detect all "auto" records of the chunk in one go
+    auto = [record for record in records if record["source_lang"] == "auto" and record["text"].strip()]
+    for record, (code, _) in zip(auto, _language_id.identify_batch([record["text"] for record in auto])):
+        record["source_lang"] = code
+
+    groups = {}
+    for i, record in enumerate(records):
+        text = record["text"]
+        if not text.strip():
+            record["translation"] = ""
+            continue
+        if record["source_lang"] is None:
+            record["source_lang"] = "auto"
+            record["error"] = "Could not detect the language."
+            continue
+        if record["source_lang"] not in LANGUAGES.values() or record["target_lang"] not in LANGUAGES.values():
+            record["error"] = f"Unsupported language pair {record['source_lang']}->{record['target_lang']}."
+            continue
+        groups.setdefault((record["source_lang"], record["target_lang"]), []).append(i)
+
+    padding_stats = PaddingStats()
+    sentences = 0
+    for (source_lang, target_lang), indices in groups.items():
+        group = [records[i] for i in indices]
+        try:
+            sentences += translate_records(group, source_lang, target_lang, batch_size, max_chars, padding_stats,
+                                           generate_kwargs)
+        except Exception:
+            # Retry one record at a time, so one bad record doesn't fail the whole group
+            for record in group:
+                try:
+                    sentences += translate_records([record], source_lang, target_lang, batch_size, max_chars,
+                                                   padding_stats, generate_kwargs)
+                except Exception as e:
+                    record["error"] = f"Translation error: {str(e)}"
+    return records, padding_stats.stats(), sentences
+
+
+class ResultWriter:
+    """
+    Appends results as JSONL or CSV and checkpoints how many input records
+    (and how many output bytes) are safely on disk.
+    """
+
+    def __init__(self, path, checkpoint):
+        self.path = path
+        self.checkpoint_path = f"{path}.checkpoint"
+        self.done = checkpoint["done"]
+        self.is_csv = path.endswith(".csv")
+        new_file = self.done == 0 or not os.path.exists(path)
+        self.file = open(path, "w" if new_file else "r+", newline="", encoding="utf-8")
+        if not new_file:
+            # Drop anything written after the last checkpoint (e.g. by a crashed run)
+            self.file.seek(checkpoint["offset"])
+            self.file.truncate()
+        if self.is_csv:
+            self.csv = csv.DictWriter(self.file, fieldnames=OUTPUT_FIELDS, extrasaction="ignore")
+            if new_file:
+                self.csv.writeheader()
+
+    def write(self, records):
+        for record in records:
+            if self.is_csv:
+                self.csv.writerow(record)
+            else:
+                self.file.write(json.dumps(record, ensure_ascii=False) + "\n")
+        self.file.flush()
+        os.fsync(self.file.fileno())
+        self.done += len(records)
+        # Write the checkpoint only after the output is on disk
+        tmp_path = f"{self.checkpoint_path}.tmp"
+        with open(tmp_path, "w") as f:
+            json.dump({"done": self.done, "offset": self.file.tell()}, f)
+        os.replace(tmp_path, self.checkpoint_path)
+
+    def close(self):
+        self.file.close()
+
+
+def load_checkpoint(output_path):
+    try:
+        with open(f"{output_path}.checkpoint") as f:
+            checkpoint = json.load(f)
+        return {"done": int(checkpoint["done"]), "offset": int(checkpoint["offset"])}
+    except (OSError, ValueError, KeyError, TypeError):
+        return {"done": 0, "offset": 0}
+
+
+def peak_memory_mb():
+    """Peak RSS of this process and of the largest worker (once the pool has exited), in MB."""
+    own = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+    children = resource.getrusage(resource.RUSAGE_CHILDREN).ru_maxrss / 1024
+    return own, children
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("input", help="JSONL or CSV file with a 'text' field/column")
+    parser.add_argument("output", help="JSONL or CSV file for the results")
+    parser.add_argument("--source-lang", default="auto", help="default when a record has none")
+    parser.add_argument("--target-lang", default="en", help="default when a record has none")
+    parser.add_argument("--workers", type=int, default=None, help="worker processes (default: cores / threads)")
+    parser.add_argument("--threads", type=int, default=1, help="torch threads per worker")
+    parser.add_argument("--chunk-size", type=int, default=256, help="records sent to a worker at a time")
+    parser.add_argument("--batch-size", type=int, default=16, help="sentences per generate call")
+    parser.add_argument("--max-chunk-chars", type=int, default=400,
+                        help="longer texts are split into sentences of at most this many characters")
+    parser.add_argument("--quantization", default="fp32", choices=["fp32", "int8", "bf16"])
+    parser.add_argument("--preset", default="quality-beam", choices=list(TRANSLATION_PRESETS),
+                        help="decoding preset (see decoding.py)")
+    parser.add_argument("--langid-threshold", type=float, default=0.8,
+                        help="minimum confidence for detected source languages")
+    parser.add_argument("--restart", action="store_true", help="ignore an existing checkpoint")
+    args = parser.parse_args()
+
+    workers = args.workers or max(1, (os.cpu_count() or 1) // args.threads)
+    checkpoint = {"done": 0, "offset": 0} if args.restart else load_checkpoint(args.output)
+    if checkpoint["done"]:
+        print(f"Resuming after {checkpoint['done']} records", file=sys.stderr)
+
+    records = read_records(args.input, args.source_lang, args.target_lang)
+    for _ in range(checkpoint["done"]):
+        next(records, None)
+
+    writer = ResultWriter(args.output, checkpoint)
+    start = time.perf_counter()
+    sentences = 0
+    padding_stats = PaddingStats()
+
+    with ProcessPoolExecutor(workers, initializer=init_worker, initargs=(args.quantization, args.threads, args.langid_threshold)) as pool:
+        in_flight = {}  # future -> chunk number
+        finished = OrderedDict()  # chunk number -> records, waiting for their turn to be written
+        next_to_write = 0
+        chunk_iter = enumerate(chunks(records, args.chunk_size))
+        exhausted = False
+
+        while True:
+            # Keep a bounded number of chunks in flight so memory stays flat
+            while not exhausted and len(in_flight) < workers * 2:
+                item = next(chunk_iter, None)
+                if item is None:
+                    exhausted = True
+                    break
+                number, chunk = item
+                in_flight[pool.submit(translate_chunk, chunk, args.batch_size, TRANSLATION_PRESETS[args.preset],
+                                      args.max_chunk_chars)] = number
+            if not in_flight:
+                break
+
+            done, _ = wait(in_flight, return_when=FIRST_COMPLETED)
+            for future in done:
+                chunk, chunk_padding, chunk_sentences = future.result()
+                finished[in_flight.pop(future)] = chunk
+                padding_stats.merge(chunk_padding)
+                sentences += chunk_sentences
+
+            # Write finished chunks in input order
+            while next_to_write in finished:
+                chunk = finished.pop(next_to_write)
+                writer.write(chunk)
+                next_to_write += 1
+
+            elapsed = time.perf_counter() - start
+            print(f"\r{writer.done} records  {sentences / elapsed:.1f} sentences/s  "
+                  f"padding {padding_stats.stats()['padding_ratio']:.1%}", end="", file=sys.stderr)
+
+    writer.close()
+    elapsed = time.perf_counter() - start
+    own_mb, worker_mb = peak_memory_mb()
+    print(file=sys.stderr)
+    done = writer.done - checkpoint["done"]
+    print(f"Translated {done} records ({sentences} sentences) in {elapsed:.1f}s "
+          f"({done / elapsed if elapsed else 0:.1f} records/s, {sentences / elapsed if elapsed else 0:.1f} sentences/s) "
+          f"with {workers} workers x {args.threads} threads", file=sys.stderr)
+    print(f"Peak memory: main {own_mb:.0f} MB, largest worker {worker_mb:.0f} MB", file=sys.stderr)
+    padding = padding_stats.stats()
+    print(f"Padding: {padding['padding_ratio']:.1%} of {padding['padded_tokens']} input tokens "
+          f"over {padding['batches']} batches", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
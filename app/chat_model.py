@@ -0,0 +1,56 @@
+import time
+
+from transformers import AutoModelForCausalLM, AutoTokenizer
+
+from quantization import quantize
+from streaming import stream_generation
+
+# A GPT-style model from Hugging Face
+MODEL_NAME = "facebook/opt-1.3b"  # Or any other causal LM on Hugging Face
+
+
+def load_chat_model(quantization="fp32"):
+    tokenizer_gpt = AutoTokenizer.from_pretrained(MODEL_NAME)
+    model_gpt = AutoModelForCausalLM.from_pretrained("deepseek-ai/DeepSeek-R1", trust_remote_code=True)
+    model_gpt = quantize(model_gpt, quantization)
+    return {"tokenizer": tokenizer_gpt, "model": model_gpt}
+
+
+def generate_text(chat_model, prompt, decoding, kv_cache=None, conversation_id=None, latency_model=None,
+                  streamer=None):
+    """
+    Generate a continuation of `prompt` and return the decoded prompt +
+    continuation. `decoding` are the generate() kwargs (see decoding.py).
+    With a `kv_cache` (a KVCacheStore) and a `conversation_id`, the cached
+    key/values of the earlier turns are reused (full prefill if evicted, or
+    with beam search).
+    The measured cost per token is fed to `latency_model`.
+    """
+    tokenizer_gpt = chat_model["tokenizer"]
+    model_gpt = chat_model["model"]
+    input_ids = tokenizer_gpt.encode(prompt, return_tensors='pt')
+    generate_kwargs = dict(
+        decoding,
+        num_return_sequences=1,
+        pad_token_id=tokenizer_gpt.eos_token_id  # avoid errors with GPT-2
+    )
+    # Beam search expands input_ids to one row per beam but not the cached
+    # past (batch size 1), so the cache is only reused for single-beam decoding
+    if kv_cache is not None and conversation_id is not None and generate_kwargs.get("num_beams", 1) == 1:
+        generate_kwargs.update(kv_cache.generation_kwargs(model_gpt, conversation_id, input_ids))
+
+    start = time.perf_counter()
+    output_ids = model_gpt.generate(input_ids, streamer=streamer, **generate_kwargs)
+    if latency_model is not None:
+        latency_model.observe(
+            time.perf_counter() - start, output_ids.shape[1] - input_ids.shape[1], generate_kwargs.get("num_beams", 1)
+        )
+    return tokenizer_gpt.decode(output_ids[0], skip_special_tokens=True)
+
+
+def stream_text(chat_model, prompt, decoding, **kwargs):
+    """Yield the continuation of `prompt` in chunks, as it is generated (same arguments as generate_text)."""
+    return stream_generation(
+        chat_model["tokenizer"],
+        lambda streamer: generate_text(chat_model, prompt, decoding, streamer=streamer, **kwargs)
+    )
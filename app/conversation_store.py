@@ -0,0 +1,125 @@
+import json
+import threading
+import time
+from collections import OrderedDict
+
+from fork_safe import SQLiteConnections
+
+
+class ConversationStore:
+    """
+    Chat history per session.
+
+    Each session keeps its messages together with their token counts, and the
+    oldest turns are dropped once the history exceeds `max_tokens`, so the
+    prompt built from it (and the generation latency) stays bounded. Sessions
+    are kept in memory and evicted least recently used beyond `max_sessions`.
+    """
+
+    def __init__(self, count_tokens, max_tokens=1024, max_sessions=1000):
+        self.count_tokens = count_tokens
+        self.max_tokens = max_tokens
+        self.max_sessions = max_sessions
+        self._sessions = OrderedDict()  # session_id -> [(message, tokens), ...]
+        self._lock = threading.Lock()
+        self.dropped_messages = 0
+
+    def _load(self, session_id):
+        entries = self._sessions.get(session_id)
+        if entries is not None:
+            self._sessions.move_to_end(session_id)
+        return list(entries or [])
+
+    def _save(self, session_id, entries):
+        self._sessions[session_id] = entries
+        self._sessions.move_to_end(session_id)
+        while len(self._sessions) > self.max_sessions:
+            self._sessions.popitem(last=False)
+
+    def _delete(self, session_id):
+        self._sessions.pop(session_id, None)
+
+    def messages(self, session_id):
+        """The session's messages as [{"role": ..., "content": ...}, ...]."""
+        with self._lock:
+            return [message for message, _ in self._load(session_id)]
+
+    def append(self, session_id, role, content):
+        """Add a message and drop the oldest ones that no longer fit the token budget."""
+        message = {"role": role, "content": content}
+        tokens = self.count_tokens(f"{role}: {content}\n")
+        with self._lock:
+            entries = self._load(session_id)
+            entries.append((message, tokens))
+            total = sum(t for _, t in entries)
+            # Always keep the newest message, even if it is over budget on its own
+            while len(entries) > 1 and total > self.max_tokens:
+                _, dropped = entries.pop(0)
+                total -= dropped
+                self.dropped_messages += 1
+            self._save(session_id, entries)
+
+    def clear(self, session_id):
+        with self._lock:
+            self._delete(session_id)
+
+    def stats(self):
+        return {
+            "sessions": len(self._sessions),
+            "max_sessions": self.max_sessions,
+            "max_tokens": self.max_tokens,
+            "dropped_messages": self.dropped_messages,
+        }
+
+
+class SQLiteConversationStore(ConversationStore):
+    """
+    The same store backed by a SQLite file, so every gunicorn worker on the
+    host sees the same sessions.
+    """
+
+    def __init__(self, db_path, count_tokens, max_tokens=1024, max_sessions=1000):
+        super().__init__(count_tokens, max_tokens=max_tokens, max_sessions=max_sessions)
+        self.db_path = db_path
+        self._db = SQLiteConnections(db_path)
+        with self._db.get() as conn:
+            conn.execute(
+                "CREATE TABLE IF NOT EXISTS conversations ("
+                "session_id TEXT PRIMARY KEY, messages TEXT NOT NULL, updated REAL NOT NULL)"
+            )
+
+    def _load(self, session_id):
+        row = self._db.get().execute(
+            "SELECT messages FROM conversations WHERE session_id = ?", (session_id,)
+        ).fetchone()
+        if row is None:
+            return []
+        return [(message, tokens) for message, tokens in json.loads(row[0])]
+
+    def _save(self, session_id, entries):
+        with self._db.get() as conn:
+            conn.execute(
+                "INSERT OR REPLACE INTO conversations (session_id, messages, updated) VALUES (?, ?, ?)",
+                (session_id, json.dumps(entries), time.time()),
+            )
+            conn.execute(
+                "DELETE FROM conversations WHERE session_id NOT IN ("
+                "SELECT session_id FROM conversations ORDER BY updated DESC LIMIT ?)",
+                (self.max_sessions,),
+            )
+
+    def _delete(self, session_id):
+        with self._db.get() as conn:
+            conn.execute("DELETE FROM conversations WHERE session_id = ?", (session_id,))
+
+    def stats(self):
+        stats = super().stats()
+        stats["sessions"] = self._db.get().execute("SELECT COUNT(*) FROM conversations").fetchone()[0]
+        return stats
+
+
+def open_store(count_tokens, db_path=None, max_tokens=1024, max_sessions=1000):
+    """In-memory store, or a SQLite-backed one shared between workers when `db_path` is set."""
+    if db_path:
+        return SQLiteConversationStore(db_path, count_tokens, max_tokens=max_tokens, max_sessions=max_sessions)
+    return ConversationStore(count_tokens, max_tokens=max_tokens, max_sessions=max_sessions)
@@ -0,0 +1,83 @@
+import threading
+
+# Named decoding settings for M2M100. 'quality-beam' matches the model's own
+# defaults (5 beams); the others trade quality for latency.
+TRANSLATION_PRESETS = {
+    "fast-greedy": {"num_beams": 1, "max_new_tokens": 128},
+    "balanced": {"num_beams": 2, "max_new_tokens": 200},
+    "quality-beam": {"num_beams": 5, "max_new_tokens": 256},
+}
+
+# The same names for the chat model. 'balanced' is the original sampling setup
+# (temperature 0.9, top_p 0.9, 50 new tokens).
+CHAT_PRESETS = {
+    "fast-greedy": {"do_sample": False, "num_beams": 1, "max_new_tokens": 32},
+    "balanced": {"do_sample": True, "temperature": 0.9, "top_p": 0.9, "num_beams": 1, "max_new_tokens": 50},
+    "quality-beam": {"do_sample": False, "num_beams": 3, "max_new_tokens": 80},
+}
+
+
+class LatencyModel:
+    """
+    Running estimate of the generation cost, in seconds per generated token
+    per beam, used to turn a latency budget into `max_new_tokens` / `num_beams`.
+    """
+
+    def __init__(self, initial_seconds_per_token=0.02, smoothing=0.2):
+        self.seconds_per_token = initial_seconds_per_token
+        self.smoothing = smoothing
+        self._lock = threading.Lock()
+
+    def observe(self, seconds, new_tokens, num_beams=1):
+        if new_tokens <= 0:
+            return
+        sample = seconds / (new_tokens * max(num_beams, 1))
+        with self._lock:
+            self.seconds_per_token += self.smoothing * (sample - self.seconds_per_token)
+
+    def affordable_tokens(self, budget_seconds, num_beams):
+        return int(budget_seconds / (self.seconds_per_token * max(num_beams, 1)))
+
+
+def default_latency_models():
+    """Initial LatencyModels of the app's models; Marian models are about 4x faster than M2M100."""
+    return {"m2m100": LatencyModel(), "marian": LatencyModel(initial_seconds_per_token=0.005), "chat": LatencyModel()}
+
+
+def parse_budget(value):
+    """A latency budget in milliseconds from a form/JSON value, or None."""
+    try:
+        budget = float(value)
+    except (TypeError, ValueError):
+        return None
+    return budget if budget > 0 else None
+
+
+def decoding_kwargs(presets, name, budget_ms=None, latency_model=None, min_new_tokens=16):
+    """
+    `generate()` kwargs for the preset `name`. With a latency budget the
+    beam width is reduced first and then `max_new_tokens` is capped, so the
+    estimated generation time fits the budget (never below `min_new_tokens`).
+    """
+    if name not in presets:
+        raise ValueError(f"Unknown decoding preset '{name}'. Choose one of: {', '.join(presets)}")
+    kwargs = dict(presets[name])
+    if budget_ms is None or latency_model is None:
+        return kwargs
+
+    budget_seconds = budget_ms / 1000.0
+    num_beams = kwargs.get("num_beams", 1)
+    while num_beams > 1 and latency_model.affordable_tokens(budget_seconds, num_beams) < kwargs["max_new_tokens"]:
+        num_beams -= 1
+    kwargs["num_beams"] = num_beams
+    affordable = latency_model.affordable_tokens(budget_seconds, num_beams)
+    if affordable < kwargs["max_new_tokens"]:
+        # Rounded down to a multiple of `min_new_tokens`, so requests with
+        # similar budgets still share a batch
+        kwargs["max_new_tokens"] = max(min_new_tokens, affordable // min_new_tokens * min_new_tokens)
+    return kwargs
+
+
+def as_key(kwargs):
+    """Hashable form of generate kwargs (e.g. to group batcher requests)."""
+    return tuple(sorted(kwargs.items()))
@@ -0,0 +1,45 @@
+"""
+Per-process resources for objects created at import time, e.g. in a
+preloaded gunicorn master, and used after the workers are forked: sqlite3
+connections can't be shared across threads or forked processes, and
+threads don't survive fork().
+"""
+import os
+import sqlite3
+import threading
+
+
+class SQLiteConnections:
+    """One connection to `db_path` per thread and process, opened on first use (in WAL mode)."""
+
+    def __init__(self, db_path, timeout=5):
+        self.db_path = db_path
+        self.timeout = timeout
+        self._local = threading.local()
+
+    def get(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = sqlite3.connect(self.db_path, timeout=self.timeout)
+            conn.execute("PRAGMA journal_mode=WAL")
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+
+class ForkGuard:
+    """
+    Tells an object that starts threads (or pools) lazily when it runs in a
+    new process: then state left from the parent must be dropped and the
+    threads started again. Call with the object's own lock held.
+    """
+
+    def __init__(self):
+        self._pid = None
+
+    def new_process(self):
+        """True on the first call in each process."""
+        if self._pid == os.getpid():
+            return False
+        self._pid = os.getpid()
+        return True
@@ -0,0 +1,75 @@
+"""
+Gunicorn settings for the TikTranslate app.
+
+    cd app && gunicorn -c gunicorn.conf.py main:app
+    cd app && python main.py  (same settings, see serve.py)
+
+With PRELOAD_MODELS=1 (the default) the app and its models are loaded once
+in the master process. Forked workers then share the weight pages
+copy-on-write instead of each loading its own copy, and workers replaced on
+a graceful reload (SIGHUP) or after MAX_REQUESTS start with the models loaded.
+
+Each worker runs WEB_THREADS request threads (so concurrent requests reach
+the micro-batcher together). The cores are divided among the workers (see
+thread_plan.py): every worker is pinned to its own cores (CPU_AFFINITY=0 to
+turn off) and torch uses one intra-op thread per core, so the workers don't
+oversubscribe the CPU. TORCH_THREADS and TORCH_INTEROP_THREADS override the
+thread counts; bench_threads.py finds the best workers x threads for a host.
+With INFERENCE_SOCKET set the workers run no models (see inference_server.py):
+they are neither pinned nor import torch, and the cores stay with the server.
+"""
+import gc
+import itertools
+import os
+
+from thread_plan import apply_plan, plan_threads
+
+bind = os.environ.get("BIND", "127.0.0.1:8000")
+workers = int(os.environ.get("WEB_CONCURRENCY", 2))
+threads = int(os.environ.get("WEB_THREADS", 4))
+timeout = int(os.environ.get("WORKER_TIMEOUT", 120))
+# Time given to in-flight requests (e.g. long generations) on reload or shutdown
+graceful_timeout = int(os.environ.get("GRACEFUL_TIMEOUT", 60))
+# Recycle workers after this many requests (0: never), with some jitter so they don't restart together
+max_requests = int(os.environ.get("MAX_REQUESTS", 0))
+max_requests_jitter = max_requests // 10
+
+torch_threads = int(os.environ.get("TORCH_THREADS", 0))
+torch_interop_threads = int(os.environ.get("TORCH_INTEROP_THREADS", 0))
+cpu_affinity = os.environ.get("CPU_AFFINITY", "1") == "1"
+
+# Thin HTTP workers of an inference server have no torch threads to plan
+inference_socket = os.environ.get("INFERENCE_SOCKET")
+
+preload_app = os.environ.get("PRELOAD_MODELS", "1") == "1"
+if preload_app:
+    # Load the models in the master while importing the app
+    os.environ.setdefault("MODEL_WARMUP", "1")
+
+
+def when_ready(server):
+    if preload_app:
+        # Move everything loaded so far out of the garbage collector's reach,
+        # so collections in the workers don't write to (and un-share) those pages
+        gc.collect()
+        gc.freeze()
+
+
+def pre_fork(server, worker):
+    # Give the new worker the first free slot (its share of the cores); a
+    # replacement worker takes over the slot of the one it replaces
+    used = {getattr(other, "thread_plan_slot", None) for other in server.WORKERS.values()}
+    worker.thread_plan_slot = next(slot for slot in itertools.count() if slot not in used)
+
+
+def post_fork(server, worker):
+    if inference_socket:
+        return
+    # server.cfg.workers includes --workers given on the command line
+    plan = apply_plan(
+        plan_threads(server.cfg.workers, worker.thread_plan_slot, intra_op_threads=torch_threads,
+                     inter_op_threads=torch_interop_threads),
+        pin=cpu_affinity,
+    )
+    server.log.info("Worker %s (slot %s): CPUs %s, %s intra-op / %s inter-op torch threads",
+                    worker.pid, plan["slot"], plan["cpus"], plan["intra_op_threads"], plan["inter_op_threads"])
@@ -0,0 +1,114 @@
+import os
+import threading
+from multiprocessing.connection import Client
+
+from model_registry import ModelNotEnabled
+
+
+class InferenceError(RuntimeError):
+    """Raised when the inference server fails a request or can't be reached."""
+
+
+# Server-side exceptions that are raised again as the same type
+ERRORS = {"ModelNotEnabled": ModelNotEnabled, "ValueError": ValueError}
+
+
+class InferenceClient:
+    """
+    Thin client for inference_server.py, with the same methods as
+    InferenceService. Every thread keeps its own connection (reopened after
+    a fork or a broken connection); each stream uses a connection of its own.
+    The server's measured costs per token are copied into `latency_models`,
+    so latency budgets and route planning keep working in the HTTP workers.
+    """
+
+    def __init__(self, address, authkey, latency_models=None):
+        self.address = address
+        self.authkey = authkey
+        self.latency_models = latency_models or {}
+        self._local = threading.local()
+
+    def _connection(self):
+        conn = getattr(self._local, "conn", None)
+        if conn is None or self._local.pid != os.getpid():
+            conn = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+            self._local.conn = conn
+            self._local.pid = os.getpid()
+        return conn
+
+    def _update_latency(self, seconds_per_token):
+        for name, value in seconds_per_token.items():
+            if name in self.latency_models:
+                self.latency_models[name].seconds_per_token = value
+
+    def _unpack(self, kind, payload):
+        if kind == "error":
+            name, message = payload
+            raise ERRORS.get(name, InferenceError)(message)
+        result, seconds_per_token = payload
+        self._update_latency(seconds_per_token)
+        return result
+
+    def _call(self, operation, *args):
+        for attempt in range(2):
+            try:
+                conn = self._connection()
+                conn.send((operation, args))
+                kind, payload = conn.recv()
+                break
+            except (EOFError, OSError) as e:
+                # The server restarted (or the connection broke): reconnect once
+                self._local.conn = None
+                if attempt:
+                    raise InferenceError(f"Inference server unavailable: {e}")
+        return self._unpack(kind, payload)
+
+    def translate_batch(self, texts, source_lang, target_lang, backend, decoding):
+        return self._call("translate_batch", list(texts), source_lang, target_lang, backend, decoding)
+
+    def generate_text(self, prompt, decoding, conversation_id=None):
+        return self._call("generate_text", prompt, decoding, conversation_id)
+
+    def count_tokens(self, text):
+        return self._call("count_tokens", text)
+
+    def stats(self):
+        return self._call("stats")
+
+    def stream_text(self, prompt, decoding, conversation_id=None):
+        """
+        Start a stream and return an iterator over the continuation's chunks.
+        Like InferenceService.stream_text, failures to start (the server being
+        down, ModelNotEnabled, ...) are raised here rather than on iteration.
+        """
+        try:
+            conn = Client(self.address, family="AF_UNIX", authkey=self.authkey)
+        except OSError as e:
+            raise InferenceError(f"Inference server unavailable: {e}")
+        try:
+            conn.send(("stream_text", (prompt, decoding, conversation_id)))
+            message = conn.recv()
+        except (EOFError, OSError) as e:
+            conn.close()
+            raise InferenceError(f"Inference server closed the stream: {e}")
+        if message[0] == "error":
+            conn.close()
+            self._unpack(*message)
+        return self._stream(conn, message)
+
+    def _stream(self, conn, message):
+        """Yield the chunks of a started stream, from its first `message` on."""
+        with conn:
+            while True:
+                kind, payload = message
+                if kind == "chunk":
+                    yield payload
+                elif kind == "done":
+                    self._update_latency(payload)
+                    return
+                else:
+                    self._unpack(kind, payload)
+                try:
+                    message = conn.recv()
+                except (EOFError, OSError) as e:
+                    raise InferenceError(f"Inference server closed the stream: {e}")
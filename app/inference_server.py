@@ -0,0 +1,209 @@
+"""
+Local inference server: one process that owns the models.
+
+HTTP workers started with INFERENCE_SOCKET set load no models; they send
+translation batches and chat generations to this process over a Unix socket
+(see inference_client.py). Batches from every HTTP worker are merged by the
+server's own micro-batcher, so the models see full batches.
+
+    cd app && python inference_server.py --socket /tmp/tiktranslate.sock
+    cd app && INFERENCE_SOCKET=/tmp/tiktranslate.sock gunicorn -c gunicorn.conf.py main:app
+
+The models are configured with the same environment variables as main.py
+(ENABLED_MODELS, TRANSLATION_QUANTIZATION, CHAT_QUANTIZATION, ...).
+
+Requests are pickled, so only trusted clients may connect: the server and
+its HTTP workers share the secret INFERENCE_AUTHKEY (required), and the
+socket is only accessible to the user running the server.
+"""
+import argparse
+import os
+import threading
+from multiprocessing.connection import Listener
+
+from batching import MicroBatcher
+from bucketing import PaddingStats
+from chat_model import generate_text, load_chat_model, stream_text
+from decoding import default_latency_models
+from kv_cache import KVCacheStore
+from marian_pool import MarianPool
+from model_registry import ModelRegistry
+from thread_plan import apply_plan, plan_threads
+from translator import load_translation_model, translate_batch
+
+
+def register_models(models, translation_quantization="fp32", chat_quantization="fp32",
+                    marian_pool_bytes=1024 * 1024 * 1024):
+    """Register the app's models: M2M100 ("translation"), the Marian pool ("marian") and "chat"."""
+    models.register("translation", lambda: load_translation_model(translation_quantization))
+    models.register("marian", lambda: MarianPool(max_bytes=marian_pool_bytes, quantization=translation_quantization))
+    models.register("chat", lambda: load_chat_model(chat_quantization))
+
+
+class InferenceService:
+    """
+    All the model work of the app: translation batches (M2M100 or Marian)
+    and chat generation. main.py uses it in-process, or talks to one running
+    in this server through InferenceClient, which has the same methods.
+    `latency_models` maps "m2m100", "marian" and "chat" to LatencyModels.
+    """
+
+    def __init__(self, models, latency_models, padding_stats=None, kv_cache=None, max_batch_size=16):
+        self.models = models
+        self.latency_models = latency_models
+        self.padding_stats = padding_stats or PaddingStats()
+        self.kv_cache = kv_cache
+        self.max_batch_size = max_batch_size
+
+    @classmethod
+    def from_env(cls, models=None, latency_models=None):
+        """
+        The service configured by the environment: ENABLED_MODELS (see
+        ModelRegistry.from_env), TRANSLATION_QUANTIZATION, CHAT_QUANTIZATION,
+        MARIAN_POOL_BYTES, KV_CACHE_BYTES and BATCH_MAX_SIZE.
+        """
+        models = models if models is not None else ModelRegistry.from_env()
+        register_models(
+            models,
+            translation_quantization=os.environ.get("TRANSLATION_QUANTIZATION", "fp32"),
+            chat_quantization=os.environ.get("CHAT_QUANTIZATION", "fp32"),
+            marian_pool_bytes=int(os.environ.get("MARIAN_POOL_BYTES", 1024 * 1024 * 1024)),
+        )
+        return cls(
+            models,
+            latency_models or default_latency_models(),
+            # Past key/values of each conversation, so a new chat turn only prefills the new text
+            kv_cache=KVCacheStore(max_bytes=int(os.environ.get("KV_CACHE_BYTES", 512 * 1024 * 1024))),
+            max_batch_size=int(os.environ.get("BATCH_MAX_SIZE", 16)),
+        )
+
+    def translate_batch(self, texts, source_lang, target_lang, backend, decoding):
+        """Translate texts sharing a language pair with one backend; `decoding` are the generate() kwargs."""
+        if backend == "marian":
+            return self.models.get("marian").translate(
+                texts, source_lang, target_lang, generate_kwargs=dict(decoding),
+                latency_model=self.latency_models["marian"]
+            )
+        # M2M100, bucketed by length
+        return translate_batch(
+            self.models.get("translation"), texts, source_lang, target_lang,
+            max_batch_size=self.max_batch_size, padding_stats=self.padding_stats,
+            generate_kwargs=dict(decoding), latency_model=self.latency_models["m2m100"]
+        )
+
+    def _chat_kwargs(self, conversation_id):
+        return dict(
+            kv_cache=self.kv_cache if conversation_id is not None else None,
+            conversation_id=conversation_id,
+            latency_model=self.latency_models["chat"],
+        )
+
+    def generate_text(self, prompt, decoding, conversation_id=None):
+        """The decoded prompt + continuation (see chat_model.generate_text)."""
+        return generate_text(self.models.get("chat"), prompt, dict(decoding), **self._chat_kwargs(conversation_id))
+
+    def stream_text(self, prompt, decoding, conversation_id=None):
+        """The continuation of `prompt`, in chunks."""
+        return stream_text(self.models.get("chat"), prompt, dict(decoding), **self._chat_kwargs(conversation_id))
+
+    def count_tokens(self, text):
+        return len(self.models.get("chat")["tokenizer"].encode(text))
+
+    def seconds_per_token(self):
+        return {name: model.seconds_per_token for name, model in self.latency_models.items()}
+
+    def stats(self):
+        marian = self.models.get("marian").stats() if self.models.is_loaded("marian") else None
+        return {
+            "models": self.models.stats(),
+            "padding": self.padding_stats.stats(),
+            "kv_cache": self.kv_cache.stats() if self.kv_cache is not None else None,
+            "marian": marian,
+            "seconds_per_token": self.seconds_per_token(),
+        }
+
+
+def handle(conn, service, batcher):
+    """
+    Serve one client connection. Requests are (operation, args) tuples;
+    replies are ("ok", (result, seconds_per_token)) or ("error", (type, message)).
+    "stream_text" replies with ("chunk", text) messages and then ("done", seconds_per_token).
+    """
+    with conn:
+        while True:
+            try:
+                operation, args = conn.recv()
+            except (EOFError, OSError):
+                return
+            try:
+                if operation == "stream_text":
+                    for chunk in service.stream_text(*args):
+                        conn.send(("chunk", chunk))
+                    conn.send(("done", service.seconds_per_token()))
+                    continue
+                if operation == "translate_batch":
+                    # Merged with the batches of the other HTTP workers
+                    texts, *key = args
+                    futures = [batcher.submit(text, *key) for text in texts]
+                    result = [future.result() for future in futures]
+                elif operation in ("generate_text", "count_tokens", "stats"):
+                    result = getattr(service, operation)(*args)
+                else:
+                    raise ValueError(f"Unknown operation '{operation}'")
+                conn.send(("ok", (result, service.seconds_per_token())))
+            except (EOFError, OSError):
+                return
+            except Exception as e:
+                conn.send(("error", (type(e).__name__, str(e))))
+
+
+def serve(address, service, authkey, max_batch_size=16, max_wait_ms=20):
+    """Accept clients authenticated with `authkey` on the Unix socket `address`, one thread per connection."""
+    if not authkey:
+        raise ValueError("The inference server needs an authkey (INFERENCE_AUTHKEY).")
+    batcher = MicroBatcher(service.translate_batch, max_batch_size=max_batch_size, max_wait_ms=max_wait_ms)
+    if os.path.exists(address):
+        os.unlink(address)
+    # Create the socket with 0600 permissions (the umask applies when it is bound)
+    umask = os.umask(0o177)
+    try:
+        listener = Listener(address, family="AF_UNIX", authkey=authkey)
+    finally:
+        os.umask(umask)
+    with listener:
+        print(f"Inference server listening on {address}", flush=True)
+        while True:
+            try:
+                conn = listener.accept()
+            except OSError:
+                continue  # e.g. a client that failed authentication
+            threading.Thread(target=handle, args=(conn, service, batcher), name="inference-client", daemon=True).start()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--socket", default=os.environ.get("INFERENCE_SOCKET", "/tmp/tiktranslate.sock"))
+    parser.add_argument("--threads", type=int, default=None, help="torch threads (default: all cores)")
+    parser.add_argument("--no-warmup", action="store_true", help="load the models on first use")
+    args = parser.parse_args()
+    if not os.environ.get("INFERENCE_AUTHKEY"):
+        parser.error("set INFERENCE_AUTHKEY to a secret shared with the HTTP workers")
+
+    # One process for all the cores (or --threads of them), see thread_plan.py
+    apply_plan(plan_threads(1, 0, intra_op_threads=args.threads), pin=False)
+
+    service = InferenceService.from_env()
+    if not args.no_warmup:
+        # The Marian pool itself is cheap; its pair models still load on demand
+        service.models.warmup()
+
+    serve(
+        args.socket, service,
+        authkey=os.environ["INFERENCE_AUTHKEY"].encode(),
+        max_batch_size=service.max_batch_size,
+        max_wait_ms=float(os.environ.get("BATCH_MAX_WAIT_MS", 20)),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,178 @@
+import heapq
+import itertools
+import json
+import threading
+import time
+import uuid
+from concurrent.futures import ProcessPoolExecutor
+
+from fork_safe import ForkGuard, SQLiteConnections
+
+# Lower runs first
+PRIORITIES = {"high": 0, "normal": 1, "low": 2}
+
+
+class QueueFull(RuntimeError):
+    """Raised by JobQueue.submit() when `max_pending` jobs are already waiting."""
+
+
+class JobQueue:
+    """
+    Runs jobs in the background, in priority order.
+
+    `submit()` returns a job id right away; `workers` threads take jobs from
+    a bounded priority queue (FIFO within a priority) and call `run(payload)`
+    either on the thread itself or, with executor="process", in a process
+    pool (then `run` must be picklable and `initializer` prepares each
+    process). `finish(payload, result)`, if given, post-processes the result
+    on the worker thread, in this process. Finished jobs are kept for `ttl`
+    seconds; with `db_path` their status is also written to SQLite so any
+    gunicorn worker on the host can answer `get()`.
+    """
+
+    def __init__(self, run, workers=2, max_pending=64, executor="thread", initializer=None, initargs=(),
+                 finish=None, ttl=600, db_path=None):
+        if executor not in ("thread", "process"):
+            raise ValueError(f"Unknown job executor '{executor}'. Choose 'thread' or 'process'.")
+        self.run = run
+        self.workers = workers
+        self.max_pending = max_pending
+        self.executor = executor
+        self.initializer = initializer
+        self.initargs = initargs
+        self.finish = finish
+        self.ttl = ttl
+        self.db_path = db_path
+        self._lock = threading.Lock()
+        self._db = SQLiteConnections(db_path) if db_path else None
+        self._process = ForkGuard()
+        self._reset()
+        self.rejected = 0
+
+        if db_path:
+            with self._db.get() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS jobs ("
+                    "id TEXT PRIMARY KEY, job TEXT NOT NULL, updated REAL NOT NULL)"
+                )
+
+    def _reset(self):
+        # A condition copied by fork() still lists the parent's waiting threads
+        self._ready = threading.Condition(self._lock)
+        self._heap = []
+        self._jobs = {}
+        self._order = itertools.count()
+        self._threads = []
+        self._pool = None
+
+    def _ensure_workers(self):
+        # Started lazily, see fork_safe.py
+        with self._lock:
+            if self._process.new_process():
+                self._reset()
+            elif all(thread.is_alive() for thread in self._threads):
+                return
+            if self.executor == "process" and self._pool is None:
+                self._pool = ProcessPoolExecutor(self.workers, initializer=self.initializer, initargs=self.initargs)
+            self._threads = [thread for thread in self._threads if thread.is_alive()]
+            while len(self._threads) < self.workers:
+                thread = threading.Thread(target=self._work, name="job-worker", daemon=True)
+                thread.start()
+                self._threads.append(thread)
+
+    def _save(self, job):
+        if self.db_path:
+            with self._db.get() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO jobs (id, job, updated) VALUES (?, ?, ?)",
+                    (job["id"], json.dumps(job), time.time()),
+                )
+
+    def _expire(self):
+        cutoff = time.time() - self.ttl
+        with self._lock:
+            for job_id in [job_id for job_id, job in self._jobs.items()
+                           if job["finished"] is not None and job["finished"] < cutoff]:
+                del self._jobs[job_id]
+        if self.db_path:
+            with self._db.get() as conn:
+                conn.execute("DELETE FROM jobs WHERE updated < ? AND json_extract(job, '$.finished') IS NOT NULL",
+                             (cutoff,))
+
+    def submit(self, payload, priority=PRIORITIES["normal"]):
+        """Queue a job and return its id. Raises QueueFull if the queue is full."""
+        self._ensure_workers()
+        self._expire()
+        job = {
+            "id": uuid.uuid4().hex,
+            "status": "queued",
+            "priority": priority,
+            "submitted": time.time(),
+            "started": None,
+            "finished": None,
+            "result": None,
+            "error": None,
+        }
+        with self._lock:
+            if len(self._heap) >= self.max_pending:
+                self.rejected += 1
+                raise QueueFull(f"Too many pending jobs (max {self.max_pending}).")
+            # Written before a worker can see the job, so the queued row never replaces a later status
+            self._save(job)
+            self._jobs[job["id"]] = job
+            heapq.heappush(self._heap, (priority, next(self._order), job["id"], payload))
+            self._ready.notify()
+        return job["id"]
+
+    def get(self, job_id):
+        """The job's status dict, or None if it is unknown (or expired)."""
+        with self._lock:
+            job = self._jobs.get(job_id)
+            if job is not None:
+                return dict(job)
+        if self.db_path:
+            row = self._db.get().execute("SELECT job FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is not None:
+                return json.loads(row[0])
+        return None
+
+    def pending(self):
+        return len(self._heap)
+
+    def _work(self):
+        while True:
+            with self._ready:
+                while not self._heap:
+                    self._ready.wait()
+                _, _, job_id, payload = heapq.heappop(self._heap)
+                job = self._jobs[job_id]
+                job.update(status="running", started=time.time())
+            self._save(job)
+
+            try:
+                if self._pool is not None:
+                    result = self._pool.submit(self.run, payload).result()
+                else:
+                    result = self.run(payload)
+                if self.finish is not None:
+                    result = self.finish(payload, result)
+                outcome = {"status": "done", "result": result}
+            except Exception as e:
+                outcome = {"status": "failed", "error": str(e)}
+            with self._lock:
+                job.update(outcome, finished=time.time())
+            self._save(job)
+
+    def stats(self):
+        with self._lock:
+            statuses = [job["status"] for job in self._jobs.values()]
+        return {
+            "executor": self.executor,
+            "workers": self.workers,
+            "pending": self.pending(),
+            "max_pending": self.max_pending,
+            "running": statuses.count("running"),
+            "done": statuses.count("done"),
+            "failed": statuses.count("failed"),
+            "rejected": self.rejected,
+        }
@@ -0,0 +1,114 @@
+import inspect
+import threading
+from collections import OrderedDict
+
+import torch
+
+
+def past_bytes(past_key_values):
+    """Memory held by a legacy (tuple of tuples) past_key_values structure."""
+    total = 0
+    for layer in past_key_values:
+        for tensor in layer:
+            total += tensor.numel() * tensor.element_size()
+    return total
+
+
+def supports_past(model):
+    return "past_key_values" in inspect.signature(model.prepare_inputs_for_generation).parameters
+
+
+class KVCacheStore:
+    """
+    Keeps the model's past key/values per conversation, so a new chat turn only
+    prefills the tokens that were added since the previous turn.
+
+    Entries are evicted least recently used once `max_bytes` is exceeded; an
+    evicted (or non-matching) conversation simply falls back to a full prefill.
+    """
+
+    def __init__(self, max_bytes=512 * 1024 * 1024):
+        self.max_bytes = max_bytes
+        self._entries = OrderedDict()  # conversation_id -> (token_ids, past, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.reused_tokens = 0
+        self.prefilled_tokens = 0
+
+    def _pop(self, conversation_id):
+        entry = self._entries.pop(conversation_id, None)
+        if entry is not None:
+            self._bytes -= entry[2]
+        return entry
+
+    def put(self, conversation_id, token_ids, past_key_values):
+        size = past_bytes(past_key_values)
+        with self._lock:
+            self._pop(conversation_id)
+            if size > self.max_bytes:
+                return
+            self._entries[conversation_id] = (token_ids, past_key_values, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                self._pop(next(iter(self._entries)))
+
+    def get(self, conversation_id):
+        with self._lock:
+            entry = self._entries.get(conversation_id)
+            if entry is None:
+                return None
+            self._entries.move_to_end(conversation_id)
+            return entry[0], entry[1]
+
+    def discard(self, conversation_id):
+        with self._lock:
+            self._pop(conversation_id)
+
+    @torch.no_grad()
+    def generation_kwargs(self, model, conversation_id, input_ids):
+        """
+        Return extra `generate()` kwargs (`past_key_values`) covering all but
+        the last token of `input_ids`, prefilling only what the cache is missing.
+        """
+        if input_ids.shape[0] != 1 or input_ids.shape[1] < 2 or not supports_past(model):
+            return {}
+
+        ids = input_ids[0]
+        past, start = None, 0
+        entry = self.get(conversation_id)
+        if entry is not None:
+            cached_ids, cached_past = entry
+            n = cached_ids.shape[0]
+            if n < ids.shape[0] and torch.equal(ids[:n], cached_ids):
+                past, start = cached_past, n
+
+        with self._lock:
+            if past is None:
+                self.misses += 1
+            else:
+                self.hits += 1
+                self.reused_tokens += start
+            self.prefilled_tokens += ids.shape[0] - 1 - start
+
+        # generate() only feeds the last token when past_key_values is given
+        # (and builds new tensors for the cache), so the stored entry stays valid
+        prefix = input_ids[:, start:-1]
+        if prefix.shape[1] > 0:
+            outputs = model(prefix, past_key_values=past, use_cache=True)
+            past = outputs.past_key_values
+
+        self.put(conversation_id, ids[:-1].clone(), past)
+        return {"past_key_values": past}
+
+    def stats(self):
+        return {
+            "conversations": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "misses": self.misses,
+            "reused_tokens": self.reused_tokens,
+            "prefilled_tokens": self.prefilled_tokens,
+        }
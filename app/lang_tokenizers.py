@@ -0,0 +1,39 @@
+import copy
+
+
+class TokenizerPool:
+    """
+    Thread-safe encoding for M2M100.
+
+    `M2M100Tokenizer.src_lang` is mutable state on the tokenizer, so setting it
+    on a shared instance races between request threads. The pool keeps one
+    pre-configured copy of the tokenizer per source language and never mutates
+    a copy after it has been created. Only the `languages` given up front are
+    served: every copy holds a full tokenizer, so they are never added on demand.
+    """
+
+    def __init__(self, tokenizer, languages=()):
+        self.base = tokenizer
+        self._tokenizers = {code: self._make(code) for code in languages}
+
+    def _make(self, src_lang):
+        tok = copy.deepcopy(self.base)
+        tok.src_lang = src_lang
+        return tok
+
+    def get(self, src_lang):
+        """Return the tokenizer configured for `src_lang`. Raises ValueError for languages not in the pool."""
+        try:
+            return self._tokenizers[src_lang]
+        except KeyError:
+            raise ValueError(f"Source language '{src_lang}' not supported.")
+
+    def encode(self, texts, src_lang, **kwargs):
+        """Encode `texts` with the source language tag for `src_lang`."""
+        return self.get(src_lang)(texts, **kwargs)
+
+    def get_lang_id(self, lang):
+        return self.base.get_lang_id(lang)
+
+    def batch_decode(self, sequences, **kwargs):
+        return self.base.batch_decode(sequences, **kwargs)
@@ -0,0 +1,131 @@
+import math
+import re
+import unicodedata
+from functools import lru_cache
+
+from langdetect.detector_factory import PROFILES_DIRECTORY, DetectorFactory
+from langdetect.utils.ngram import NGram
+
+URL_RE = re.compile(r"https?://[-_.?&~;+=/#0-9A-Za-z]{1,2076}")
+MAIL_RE = re.compile(r"[-_.0-9A-Za-z]{1,64}@[-_0-9A-Za-z]{1,255}[-_.0-9A-Za-z]{1,255}")
+TAG_RE = re.compile(r"[#@]\w+")
+
+# langdetect profile names that map to our language codes
+PROFILE_ALIASES = {"zh-cn": "zh", "zh-tw": "zh"}
+
+# Scripts that identify a language on their own among the supported codes
+SCRIPT_LANGUAGES = {"HIRAGANA": "ja", "KATAKANA": "ja", "ARABIC": "ar", "CYRILLIC": "ru", "CJK": "zh"}
+
+
+def strip_noise(text):
+    """Remove URLs, e-mail addresses and #hashtags/@mentions, which say little about the language."""
+    return TAG_RE.sub(" ", MAIL_RE.sub(" ", URL_RE.sub(" ", text)))
+
+
+def script_of(ch):
+    name = unicodedata.name(ch, "")
+    for script in SCRIPT_LANGUAGES:
+        if name.startswith(script):
+            return script
+    return "LATIN" if name.startswith("LATIN") else None
+
+
+class LanguageIdentifier:
+    """
+    Deterministic language identification restricted to a fixed set of codes.
+
+    Non-Latin scripts are resolved by counting characters (kana -> ja, Han ->
+    zh, Arabic -> ar, Cyrillic -> ru). Latin-script text is scored with a
+    naive Bayes over langdetect's character n-gram profiles, only for the
+    allowed languages, so there are no random trials and the result is always
+    the same. The profiles are loaded once, in the constructor, and results
+    are cached per text. `identify()` returns (code, confidence), with code
+    None when the confidence is below `threshold`.
+    """
+
+    def __init__(self, codes, threshold=0.8, cache_size=10000, smoothing=1e-5):
+        self.codes = set(codes)
+        self.threshold = threshold
+        self.smoothing = smoothing
+
+        factory = DetectorFactory()
+        factory.load_profile(PROFILES_DIRECTORY)
+        # Columns of the profile table for the allowed Latin-script languages
+        self._columns = []
+        for i, lang in enumerate(factory.langlist):
+            code = PROFILE_ALIASES.get(lang, lang)
+            if code in self.codes and code not in SCRIPT_LANGUAGES.values():
+                self._columns.append((i, code))
+        self._probabilities = factory.word_lang_prob_map
+
+        self.identify = lru_cache(maxsize=cache_size)(self._identify)
+
+    def _ngrams(self, text):
+        ngram = NGram()
+        for ch in NGram.normalize_vi(text):
+            ngram.add_char(ch)
+            if ngram.capitalword:
+                continue
+            for n in range(1, NGram.N_GRAM + 1):
+                if len(ngram.grams) < n:
+                    break
+                gram = ngram.grams[-n:]
+                if gram != " " and gram in self._probabilities:
+                    yield gram
+
+    def _identify(self, text):
+        text = strip_noise(text)
+
+        # 1) Unambiguous scripts
+        counts = {}
+        for ch in text:
+            if ch.isalpha():
+                script = script_of(ch)
+                if script is not None:
+                    counts[script] = counts.get(script, 0) + 1
+        if not counts:
+            return None, 0.0
+        if counts.get("HIRAGANA") or counts.get("KATAKANA"):
+            script = "HIRAGANA"  # kana only appears in Japanese
+        else:
+            script = max(counts, key=counts.get)
+        if script != "LATIN":
+            code = SCRIPT_LANGUAGES[script]
+            confidence = counts[script] / sum(counts.values()) if script != "HIRAGANA" else 1.0
+            return (code if code in self.codes and confidence >= self.threshold else None), confidence
+
+        # 2) Naive Bayes over the n-gram profiles of the Latin-script languages
+        scores = [0.0] * len(self._columns)
+        seen = False
+        for gram in self._ngrams(text):
+            seen = True
+            probabilities = self._probabilities[gram]
+            for j, (column, _) in enumerate(self._columns):
+                scores[j] += math.log(probabilities[column] + self.smoothing)
+        if not seen or not scores:
+            return None, 0.0
+
+        best = max(scores)
+        weights = [math.exp(score - best) for score in scores]
+        j = scores.index(best)
+        confidence = weights[j] / sum(weights)
+        code = self._columns[j][1]
+        return (code if confidence >= self.threshold else None), confidence
+
+    def identify_batch(self, texts):
+        return [self.identify(text) for text in texts]
+
+    def detect(self, text):
+        """The language code of `text`, or None if it can't be told confidently."""
+        return self.identify(text)[0]
+
+    def stats(self):
+        info = self.identify.cache_info()
+        lookups = info.hits + info.misses
+        return {
+            "cache_entries": info.currsize,
+            "hits": info.hits,
+            "misses": info.misses,
+            "hit_rate": (info.hits / lookups) if lookups else 0.0,
+            "threshold": self.threshold,
+        }
@@ -0,0 +1,78 @@
+import threading
+import time
+from collections import deque
+
+# Serving modes, from full quality to the most degraded
+NORMAL = "normal"            # the requested decoding preset
+GREEDY = "greedy"            # greedy decoding instead of beam search
+SHORT = "short"              # greedy, with half the max_new_tokens
+SMALL_MODEL = "small-model"  # routed to a smaller, faster model
+
+
+class LoadController:
+    """
+    Chooses the serving mode from the current load.
+
+    Load is the larger of queue depth / `max_depth` and p95 latency (over the
+    requests of the last `window_seconds`, at most `max_samples` of them) /
+    `max_p95_ms`, so a spike stops counting once it is over, even without traffic. A load of 1 or more moves one mode
+    down (NORMAL -> GREEDY -> SHORT -> SMALL_MODEL), at most once every
+    `cooldown` seconds; it moves back up one mode at a time once the load
+    drops below `recover_below`. SMALL_MODEL is only used when `small_model`
+    is True.
+    """
+
+    def __init__(self, queue_depth, max_depth=32, max_p95_ms=2000.0, window_seconds=30.0, max_samples=1000,
+                 recover_below=0.5, cooldown=5.0, small_model=False):
+        self.queue_depth = queue_depth
+        self.max_depth = max_depth
+        self.max_p95 = max_p95_ms / 1000.0
+        self.recover_below = recover_below
+        self.cooldown = cooldown
+        self.modes = [NORMAL, GREEDY, SHORT] + ([SMALL_MODEL] if small_model else [])
+        self.window = window_seconds
+        self._latencies = deque(maxlen=max_samples)  # (time, seconds)
+        self._lock = threading.Lock()
+        self._level = 0
+        self._changed = 0.0
+        self._served = {mode: 0 for mode in self.modes}
+
+    def record(self, seconds):
+        """Record the latency of one finished request."""
+        with self._lock:
+            self._latencies.append((time.monotonic(), seconds))
+
+    def p95(self):
+        cutoff = time.monotonic() - self.window
+        with self._lock:
+            while self._latencies and self._latencies[0][0] < cutoff:
+                self._latencies.popleft()
+            latencies = sorted(seconds for _, seconds in self._latencies)
+        return latencies[int(0.95 * (len(latencies) - 1))] if latencies else 0.0
+
+    def load(self):
+        return max(self.queue_depth() / self.max_depth, self.p95() / self.max_p95)
+
+    def mode(self):
+        """The mode to serve the next request with."""
+        load = self.load()
+        now = time.monotonic()
+        with self._lock:
+            if now - self._changed >= self.cooldown:
+                if load >= 1 and self._level < len(self.modes) - 1:
+                    self._level += 1
+                    self._changed = now
+                elif load < self.recover_below and self._level > 0:
+                    self._level -= 1
+                    self._changed = now
+            mode = self.modes[self._level]
+            self._served[mode] += 1
+        return mode
+
+    def stats(self):
+        return {
+            "mode": self.modes[self._level],
+            "queue_depth": self.queue_depth(),
+            "p95_ms": self.p95() * 1000,
+            "served": dict(self._served),
+        }
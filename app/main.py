@@ -1,31 +1,284 @@
-from flask import Flask, request, redirect, render_template, url_for,jsonify
-from transformers import M2M100ForConditionalGeneration, M2M100Tokenizer,AutoTokenizer, AutoModelForCausalLM
-from langdetect import detect, LangDetectException
-import sentencepiece  # Needed by M2M100 for tokenization
-from gtts import gTTS
+from flask import Flask, g, request, redirect, render_template, session, url_for, jsonify
 import os
+import tempfile
+import time
 import uuid
 
+from audio_store import AudioStore
+from batching import MicroBatcher
+from conversation_store import open_store
+from decoding import CHAT_PRESETS, TRANSLATION_PRESETS, as_key, decoding_kwargs, default_latency_models, parse_budget
+from inference_client import InferenceClient, InferenceError
+from jobs import PRIORITIES, JobQueue, QueueFull
+from language_id import LanguageIdentifier
+from load_control import GREEDY, NORMAL, SHORT, SMALL_MODEL, LoadController
+from marian_pool import MARIAN_MODELS
+from model_registry import ModelNotEnabled, ModelRegistry
+from routing import RoutePlanner, RouteRunner
+from segmentation import join_sentences, split_sentences
+from speech import SpeechService
+from streaming import sse_response, sse_stream, wants_stream
+import thread_plan
+from translation_cache import TranslationCache
+from translator import LANGUAGES, model_name
+from tts_backends import get_backend
+
 app = Flask(__name__)
+# Signs the session cookie that identifies each chat conversation; set it in production
+app.secret_key = os.environ.get("FLASK_SECRET_KEY", "dev-secret-key")
+
+# Models are loaded on first use. ENABLED_MODELS picks which ones this
+# deployment may load (e.g. "translation" only) and MODEL_WARMUP=1 loads
+# them at startup instead of on the first request.
+models = ModelRegistry.from_env()
+
+# Inference precision per model: 'fp32', 'int8' (dynamic) or 'bf16'
+# (TRANSLATION_QUANTIZATION and CHAT_QUANTIZATION, see InferenceService.from_env)
+TRANSLATION_QUANTIZATION = os.environ.get("TRANSLATION_QUANTIZATION", "fp32")
+
+# M2M100 (see translator.py), the chat model (see chat_model.py) and dedicated
+# Marian models per language pair, much smaller and faster than M2M100.
+# Marian models are loaded on demand and at most MARIAN_POOL_BYTES of them stay
+# resident. TRANSLATION_BACKEND=marian lets the route planner use them for
+# every request; otherwise they are only used under load (see load_control.py).
+TRANSLATION_BACKEND = os.environ.get("TRANSLATION_BACKEND", "m2m100")
+
+# Decoding preset used when a request doesn't pick one: 'fast-greedy', 'balanced' or 'quality-beam'
+DECODING_PRESET = os.environ.get("DECODING_PRESET", "quality-beam")
+CHAT_DECODING_PRESET = os.environ.get("CHAT_DECODING_PRESET", "balanced")
+
+# Measured generation speed of each model, used to fit requests into their latency budget
+latency_models = default_latency_models()
+translation_latency = latency_models["m2m100"]
+marian_latency = latency_models["marian"]
+chat_latency = latency_models["chat"]
+
+def marian_covers(source_lang, target_lang):
+    return models.allows("marian") and (source_lang, target_lang) in MARIAN_MODELS
+
+# Picks, per language pair, the cheapest route by measured cost per token:
+# M2M100 or a Marian model directly, or two Marian models through English
+# (e.g. ja -> en -> pt, when no ja -> pt model exists)
+route_planner = RoutePlanner(
+    {"m2m100": lambda source_lang, target_lang: True, "marian": marian_covers},
+    latency_models={"m2m100": translation_latency, "marian": marian_latency},
+    pivot="en",
+)
+
+def translation_route(source_lang, target_lang, mode=NORMAL):
+    """The route for a pair; Marian models are only considered if enabled for the deployment or under load."""
+    allowed = ("m2m100", "marian") if TRANSLATION_BACKEND == "marian" or mode == SMALL_MODEL else ("m2m100",)
+    return route_planner.plan(source_lang, target_lang, allowed)
+
+def translation_decoding(preset=None, budget_ms=None, mode=NORMAL):
+    """
+    The decoding settings of a translation request, as a batcher key.
+    Under load (see load_control.py) beam search is replaced by greedy
+    decoding and, in the SHORT mode, the output length is halved.
+    """
+    if mode != NORMAL:
+        preset = "fast-greedy"
+    kwargs = decoding_kwargs(TRANSLATION_PRESETS, preset or DECODING_PRESET, budget_ms, translation_latency)
+    if mode == SHORT:
+        kwargs["max_new_tokens"] = max(16, kwargs["max_new_tokens"] // 2)
+    return as_key(kwargs)
+
+def cacheable(mode, budget_ms):
+    """Whether a translation is complete enough to cache (not cut short by a budget or by load)."""
+    return mode in (NORMAL, GREEDY) and budget_ms is None
+
+def cache_variant(preset=None, mode=NORMAL):
+    """
+    The translation cache variant of a request: its decoding settings without
+    the latency budget. Results of one preset (or of greedy decoding under
+    load) are never served to requests for another; a request with a budget
+    may still be served the complete translation.
+    """
+    return translation_decoding(preset, None, mode)
+
+BATCH_MAX_SIZE = int(os.environ.get("BATCH_MAX_SIZE", 16))
+
+# The model work runs in this process, or, with INFERENCE_SOCKET set, in a
+# separate inference server (see inference_server.py) that owns the models,
+# so HTTP workers stay small and can be scaled independently. Both sides
+# share the secret INFERENCE_AUTHKEY.
+INFERENCE_SOCKET = os.environ.get("INFERENCE_SOCKET")
+if INFERENCE_SOCKET:
+    if not os.environ.get("INFERENCE_AUTHKEY"):
+        raise RuntimeError("INFERENCE_SOCKET needs INFERENCE_AUTHKEY, the inference server's secret.")
+    inference = InferenceClient(
+        INFERENCE_SOCKET,
+        authkey=os.environ["INFERENCE_AUTHKEY"].encode(),
+        latency_models=latency_models,
+    )
+else:
+    # Imported only here: it loads torch and transformers, which thin HTTP workers don't need
+    from inference_server import InferenceService
+
+    inference = InferenceService.from_env(models, latency_models)
+
+def translate_pair(texts, source_lang, target_lang, backend, decoding):
+    """Batcher callback: translate texts sharing one language pair, backend and decoding settings."""
+    return inference.translate_batch(texts, source_lang, target_lang, backend, decoding)
+
+# Concurrent requests are collected for a short window and translated together
+batcher = MicroBatcher(
+    translate_pair,
+    max_batch_size=BATCH_MAX_SIZE,
+    max_wait_ms=float(os.environ.get("BATCH_MAX_WAIT_MS", 20)),
+)
+
+# Degrades decoding when the batcher queue or the p95 latency (over the last
+# DEGRADE_WINDOW_SECONDS) grows, and recovers when the load drops. The mode
+# is sent in the X-Serving-Mode header.
+load_controller = LoadController(
+    batcher.pending,
+    max_depth=int(os.environ.get("DEGRADE_QUEUE_DEPTH", 32)),
+    max_p95_ms=float(os.environ.get("DEGRADE_P95_MS", 2000)),
+    window_seconds=float(os.environ.get("DEGRADE_WINDOW_SECONDS", 30)),
+    cooldown=float(os.environ.get("DEGRADE_COOLDOWN", 5)),
+    small_model=models.allows("marian"),
+)
 
-# Map language names to M2M100 language codes
-LANGUAGES = {
-    'English': 'en',
-    'French': 'fr',
-    'Spanish': 'es',
-    'German': 'de',
-    'Italian': 'it',
-    'Portuguese': 'pt',
-    'Russian': 'ru',
-    'Chinese': 'zh',
-    'Japanese': 'ja',
-    'Arabic': 'ar'
-}
-
-# Load the M2M100 model & tokenizer
-model_name = "facebook/m2m100_418M"
-tokenizer = M2M100Tokenizer.from_pretrained(model_name)
-model = M2M100ForConditionalGeneration.from_pretrained(model_name)
+def serving_mode():
+    """The serving mode for this request (also reported in the response)."""
+    g.serving_mode = load_controller.mode()
+    return g.serving_mode
+
+@app.after_request
+def add_serving_mode(response):
+    if "serving_mode" in g:
+        response.headers["X-Serving-Mode"] = g.serving_mode
+    return response
+
+# Finished translations, keyed by normalized text + languages + model.
+# Set TRANSLATION_CACHE_DB to share the cache between gunicorn workers
+# (at most TRANSLATION_CACHE_DB_ROWS translations are kept there).
+translation_cache = TranslationCache(
+    f"{model_name}{'+marian' if TRANSLATION_BACKEND == 'marian' else ''}:{TRANSLATION_QUANTIZATION}",
+    max_bytes=int(os.environ.get("TRANSLATION_CACHE_BYTES", 64 * 1024 * 1024)),
+    ttl=float(os.environ.get("TRANSLATION_CACHE_TTL", 0)),
+    db_path=os.environ.get("TRANSLATION_CACHE_DB"),
+    max_rows=int(os.environ.get("TRANSLATION_CACHE_DB_ROWS", 100_000)),
+)
+
+# Runs the planned routes on the batcher. The English of pivot routes is
+# cached, so one source text translated into several targets is only
+# translated into English once.
+route_runner = RouteRunner(
+    batcher.submit,
+    cache=TranslationCache("pivot", max_bytes=int(os.environ.get("PIVOT_CACHE_BYTES", 16 * 1024 * 1024))),
+)
+
+# Long inputs are split into sentences of at most this many characters
+MAX_CHUNK_CHARS = int(os.environ.get("MAX_CHUNK_CHARS", 400))
+
+def submit_text(text, source_lang, target_lang, decoding=None, cache_results=True, mode=NORMAL, variant=None):
+    """
+    Split `text` into sentences and queue the ones not in the cache on the
+    batcher (so they are translated together, as one batch). `decoding` comes
+    from translation_decoding() (the deployment default if None); translations
+    that may have been cut short should not be cached (`cache_results`).
+    `mode` (see load_control.py) may route the sentences to Marian models.
+    The sentences are cached under `variant` (see cache_variant; `decoding` if None).
+    Returns (result, futures): result() waits for the sentences and
+    reassembles them; `futures` are the pending batcher futures, for callers
+    that would rather await them (see asgi.py).
+    """
+    decoding = decoding or translation_decoding()
+    variant = variant or decoding
+    route = translation_route(source_lang, target_lang, mode)
+    segments = split_sentences(text, MAX_CHUNK_CHARS)
+    parts = []
+    for sentence, _ in segments:
+        part = translation_cache.get(sentence, source_lang, target_lang, variant)
+        if part is None:
+            part = route_runner.submit(sentence, route, decoding, cache_results=cache_results)
+        parts.append(part)
+
+    def result():
+        translations = []
+        for (sentence, _), part in zip(segments, parts):
+            if not isinstance(part, str):
+                part = part.result()
+                if cache_results:
+                    translation_cache.set(sentence, source_lang, target_lang, part, variant)
+            translations.append(part)
+        return join_sentences(translations, [separator for _, separator in segments], target_lang)
+
+    return result, [part for part in parts if not isinstance(part, str)]
+
+# Speech backend: 'gtts' (default), 'espeak' (offline) or 'stub' (tests)
+tts_backend = get_backend(os.environ.get("TTS_BACKEND", "gtts"))
+
+# Synthesized speech, stored once per (text, language, voice)
+audio_store = AudioStore(
+    app.static_folder,
+    url_prefix=app.static_url_path,
+    max_bytes=int(os.environ.get("TTS_CACHE_BYTES", 256 * 1024 * 1024)),
+    voice=tts_backend.name,
+    extension=tts_backend.extension,
+)
+
+# Synthesis runs on a worker pool; the page gets the URL right away
+speech = SpeechService(audio_store, tts_backend, max_workers=int(os.environ.get("TTS_WORKERS", 4)))
+
+# Language identification for "auto", restricted to LANGUAGES and loaded once at startup.
+# Texts it can't tell with at least LANGID_THRESHOLD confidence are left to the user.
+language_id = LanguageIdentifier(
+    LANGUAGES.values(),
+    threshold=float(os.environ.get("LANGID_THRESHOLD", 0.8)),
+)
+
+def start_translation(text, source_lang, target_lang, preset=None, budget_ms=None):
+    """
+    Start translating one text: language detection for "auto", cache lookup and
+    sentence-by-sentence submission to the micro-batcher.
+    Returns (finish, futures): finish() waits for the translation and returns
+    (translation, source_lang, mode), where mode is the serving mode (None on a
+    cache hit); `futures` are the pending batcher futures (see submit_text).
+    Raises ValueError for unsupported languages or if the language can't be detected.
+    """
+    if target_lang not in LANGUAGES.values():
+        raise ValueError(f"Target language '{target_lang}' not supported.")
+    if source_lang != 'auto' and source_lang not in LANGUAGES.values():
+        raise ValueError(f"Source language '{source_lang}' not supported.")
+
+    # Detect language if user chose "auto". Translations are cached under the
+    # detected language only, so a cache hit reports it like a miss does.
+    if source_lang == 'auto':
+        source_lang = language_id.detect(text)
+        if source_lang is None:
+            raise ValueError("Could not detect the language. Please select manually.")
+
+    # A cache hit skips tokenization and generation
+    mode = load_controller.mode()
+    variant = cache_variant(preset, mode)
+    translation = translation_cache.get(text, source_lang, target_lang, variant)
+    if translation is not None:
+        return (lambda: (translation, source_lang, None)), []
+
+    # Translate sentence by sentence through the micro-batcher
+    decoding = translation_decoding(preset, budget_ms, mode)
+    start = time.perf_counter()
+    result, futures = submit_text(text, source_lang, target_lang, decoding, cacheable(mode, budget_ms), mode, variant)
+
+    def finish():
+        translation = result()
+        load_controller.record(time.perf_counter() - start)
+        if cacheable(mode, budget_ms):
+            translation_cache.set(text, source_lang, target_lang, translation, variant)
+        return translation, source_lang, mode
+
+    return finish, futures
+
+def translate_text(text, source_lang, target_lang, preset=None, budget_ms=None):
+    """
+    Translate one text (see start_translation) and wait for it.
+    Returns (translation, source_lang, mode). Raises ValueError for unsupported or undetectable languages.
+    """
+    finish, _ = start_translation(text, source_lang, target_lang, preset, budget_ms)
+    return finish()
 
 @app.route('/', methods=['GET', 'POST'])
 def home():
@@ -35,45 +288,30 @@ def home():
     target_lang = 'en'
     input_text = ""
     mp3_url = None  # Will hold the path to the generated TTS file
+    mp3_status = None  # 'ready' or 'pending' while the TTS worker is still running
+    preset = DECODING_PRESET
+    mode = None  # serving mode, when the model was used
 
     if request.method == 'POST':
         input_text = request.form.get('text', '')
         source_lang = request.form.get('source_lang', 'auto')
         target_lang = request.form.get('target_lang', 'en')
+        preset = request.form.get('preset') or DECODING_PRESET
 
         if input_text.strip():
             try:
-                # Detect language if user chose "auto"
-                if source_lang == 'auto':
-                    try:
-                        detected = detect(input_text)
-                        if detected not in LANGUAGES.values():
-                            raise ValueError(f"Detected language '{detected}' not supported.")
-                        source_lang = detected
-                    except LangDetectException:
-                        error = "Could not detect the language. Please select manually."
-                        source_lang = 'auto'  # keep it
-
-                if not error:
-                    # Set source language for tokenizer
-                    tokenizer.src_lang = source_lang
-                    encoded = tokenizer(input_text, return_tensors="pt")
-
-                    # Generate translation, specifying the target language
-                    generated_tokens = model.generate(
-                        **encoded,
-                        forced_bos_token_id=tokenizer.get_lang_id(target_lang)
-                    )
-                    translation = tokenizer.decode(generated_tokens[0], skip_special_tokens=True)
-
-                    # Generate TTS
-                    if translation.strip():
-                        tts = gTTS(text=translation, lang=target_lang)
-                        filename = f"tts_{uuid.uuid4().hex}.mp3"
-                        filepath = os.path.join("static", filename)
-                        tts.save(filepath)
-                        mp3_url = f"/static/{filename}"
+                translation, source_lang, mode = translate_text(
+                    input_text, source_lang, target_lang, preset, parse_budget(request.form.get('latency_budget_ms'))
+                )
+                if mode is not None:
+                    g.serving_mode = mode
+
+                # Request TTS in the background (reusing the stored file for repeated translations)
+                if translation.strip():
+                    mp3_url, mp3_status = speech.request(translation, target_lang)
 
+            except ValueError as e:
+                error = str(e)
             except Exception as e:
                 error = f"Translation error: {str(e)}"
 
@@ -85,74 +323,307 @@ def home():
         source_lang=source_lang,
         target_lang=target_lang,
         input_text=input_text,
-        mp3_url=mp3_url
+        mp3_url=mp3_url,
+        mp3_status=mp3_status,
+        presets=TRANSLATION_PRESETS,
+        preset=preset,
+        mode=mode
     )
 
-# Load a GPT-style model from Hugging Face
-MODEL_NAME = "facebook/opt-1.3b"  # Or any other causal LM on Hugging Face
-tokenizer_gpt = AutoTokenizer.from_pretrained(MODEL_NAME)
-model_gpt =  AutoModelForCausalLM.from_pretrained("deepseek-ai/DeepSeek-R1", trust_remote_code=True)
+# Largest number of items accepted by one /api/translate call
+API_MAX_ITEMS = int(os.environ.get("API_MAX_ITEMS", 1000))
+
+@app.route('/api/translate', methods=['POST'])
+def api_translate():
+    """
+    Translates many texts in one call, in padded batches per language pair.
+    Expects a JSON body: {"items": [{"text": "...", "source_lang": "auto", "target_lang": "en"}, ...]}
+    Returns JSON: {"results": [{"translation": "...", "source_lang": "fr"} or {"error": "..."}, ...],
+                   "mode": "normal"}
+    in the same order as the items; "mode" is the serving mode (see load_control.py).
+    "preset" and "latency_budget_ms" may be set for the whole call or per item.
+    """
+    data = request.get_json(silent=True)
+    items = data.get("items") if isinstance(data, dict) else data
+    if not isinstance(items, list):
+        return jsonify({"error": "Expected a JSON body with an 'items' list"}), 400
+    if len(items) > API_MAX_ITEMS:
+        return jsonify({"error": f"Too many items (max {API_MAX_ITEMS})"}), 413
+
+    defaults = data if isinstance(data, dict) else {}
+    mode = serving_mode()
+    results = [None] * len(items)
+    pending = []
+
+    # 1) Validate, look up the cache and detect languages; queue the rest on the batcher
+    for i, item in enumerate(items):
+        try:
+            if not isinstance(item, dict) or not isinstance(item.get("text"), str):
+                raise ValueError("Each item needs a 'text' string.")
+            text = item["text"]
+            requested_lang = item.get("source_lang", "auto")
+            target_lang = item.get("target_lang", "en")
+            if target_lang not in LANGUAGES.values():
+                raise ValueError(f"Target language '{target_lang}' not supported.")
+            if requested_lang != "auto" and requested_lang not in LANGUAGES.values():
+                raise ValueError(f"Source language '{requested_lang}' not supported.")
+            budget_ms = parse_budget(item.get("latency_budget_ms", defaults.get("latency_budget_ms")))
+            preset = item.get("preset", defaults.get("preset"))
+            decoding = translation_decoding(preset, budget_ms, mode)
+            variant = cache_variant(preset, mode)
+            cache_results = cacheable(mode, budget_ms)
+
+            if not text.strip():
+                results[i] = {"translation": "", "source_lang": requested_lang}
+                continue
+
+            # Cached under the detected language only, so hits and misses report the same source_lang
+            source_lang = language_id.detect(text) if requested_lang == "auto" else requested_lang
+            if source_lang is None:
+                raise ValueError("Could not detect the language.")
+
+            cached = translation_cache.get(text, source_lang, target_lang, variant)
+            if cached is not None:
+                results[i] = {"translation": cached, "source_lang": source_lang}
+                continue
+
+            result, _ = submit_text(text, source_lang, target_lang, decoding, cache_results, mode, variant)
+            pending.append((i, text, source_lang, target_lang, variant, cache_results, result))
+        except ValueError as e:
+            results[i] = {"error": str(e)}
+
+    # 2) Collect the batched translations
+    start = time.perf_counter()
+    for i, text, source_lang, target_lang, variant, cache_results, result in pending:
+        try:
+            translation = result()
+        except Exception as e:
+            results[i] = {"error": f"Translation error: {str(e)}"}
+            continue
+        if cache_results:
+            translation_cache.set(text, source_lang, target_lang, translation, variant)
+        results[i] = {"translation": translation, "source_lang": source_lang}
+    if pending:
+        load_controller.record(time.perf_counter() - start)
 
-# We'll keep a very simple global in-memory conversation store (for demonstration):
-conversation_history = []
+    return jsonify({"results": results, "mode": mode})
+
+def run_translation_job(payload):
+    """Job: translate a text like the page does (see translate_text)."""
+    translation, source_lang, mode = translate_text(
+        payload["text"], payload["source_lang"], payload["target_lang"],
+        payload.get("preset"), payload.get("latency_budget_ms"),
+    )
+    return {"translation": translation, "source_lang": source_lang, "mode": mode}
+
+def finish_translation_job(payload, result):
+    """Queue the speech in this process, so /tts-status/<filename> can follow it."""
+    if result["translation"].strip():
+        result["audio_url"], result["audio_status"] = speech.request(result["translation"], payload["target_lang"])
+    return result
+
+# Translation + speech jobs, run by JOB_WORKERS workers in the background.
+# JOB_EXECUTOR=process runs the translations in worker processes (each one
+# loads its own models). At most JOB_QUEUE_SIZE jobs wait; more get a 429.
+# Job status is kept in the SQLite file JOBS_DB (by default in the temp
+# directory), so every gunicorn worker can answer /jobs/<id>; JOBS_DB= keeps
+# it in memory, for a single worker.
+jobs = JobQueue(
+    run_translation_job,
+    workers=int(os.environ.get("JOB_WORKERS", 2)),
+    max_pending=int(os.environ.get("JOB_QUEUE_SIZE", 64)),
+    executor=os.environ.get("JOB_EXECUTOR", "thread"),
+    finish=finish_translation_job,
+    ttl=float(os.environ.get("JOB_TTL", 600)),
+    db_path=os.environ.get("JOBS_DB", os.path.join(tempfile.gettempdir(), "tiktranslate-jobs.db")) or None,
+)
+
+@app.route('/jobs', methods=['POST'])
+def submit_job():
+    """
+    Queues a translation (and its speech) and returns right away.
+    Expects a JSON body: {"text": "...", "source_lang": "auto", "target_lang": "en", "priority": "normal"}
+    ("priority" is high, normal or low; "preset" and "latency_budget_ms" are optional)
+    Returns 202 with JSON: {"id": "...", "status_url": "/jobs/<id>"}, or 429 when the queue is full.
+    """
+    data = request.get_json(silent=True)
+    if not isinstance(data, dict) or not isinstance(data.get("text"), str) or not data["text"].strip():
+        return jsonify({"error": "Expected a JSON body with a non-empty 'text'"}), 400
+    source_lang = data.get("source_lang", "auto")
+    target_lang = data.get("target_lang", "en")
+    priority = data.get("priority", "normal")
+    if target_lang not in LANGUAGES.values():
+        return jsonify({"error": f"Target language '{target_lang}' not supported."}), 400
+    if source_lang != "auto" and source_lang not in LANGUAGES.values():
+        return jsonify({"error": f"Source language '{source_lang}' not supported."}), 400
+    if data.get("preset") is not None and data["preset"] not in TRANSLATION_PRESETS:
+        return jsonify({"error": f"Unknown decoding preset '{data['preset']}'."}), 400
+    if priority not in PRIORITIES:
+        return jsonify({"error": f"Unknown priority '{priority}'. Choose one of: {', '.join(PRIORITIES)}"}), 400
+
+    payload = {
+        "text": data["text"],
+        "source_lang": source_lang,
+        "target_lang": target_lang,
+        "preset": data.get("preset"),
+        "latency_budget_ms": parse_budget(data.get("latency_budget_ms")),
+    }
+    try:
+        job_id = jobs.submit(payload, PRIORITIES[priority])
+    except QueueFull as e:
+        response = jsonify({"error": str(e)})
+        response.headers["Retry-After"] = "1"
+        return response, 429
+    return jsonify({"id": job_id, "status_url": url_for('job_status', job_id=job_id)}), 202
+
+@app.route('/jobs/<job_id>')
+def job_status(job_id):
+    """
+    Polled by clients of /jobs.
+    Returns JSON: {"id": "...", "status": "queued" | "running" | "done" | "failed",
+                   "result": {"translation": "...", "source_lang": "fr", "mode": "normal",
+                              "audio_url": "...", "audio_status": "pending"}, "error": null, ...}
+    """
+    job = jobs.get(job_id)
+    if job is None:
+        return jsonify({"error": "Unknown or expired job"}), 404
+    return jsonify(job)
+
+@app.route('/tts-status/<filename>')
+def tts_status(filename):
+    """
+    Polled by the page while speech is being synthesized.
+    Returns JSON: {"status": "ready" | "pending" | "failed" | "missing", "url": "..."}
+    """
+    return jsonify({"status": speech.status(filename), "url": audio_store.url_for(filename)})
+
+@app.route('/stats')
+def stats():
+    """Returns JSON counters for the translation batcher and caches."""
+    return jsonify({
+        "batcher": batcher.stats(),
+        "inference": inference.stats(),
+        "load": load_controller.stats(),
+        "jobs": jobs.stats(),
+        "routing": {"planner": route_planner.stats(), "runner": route_runner.stats()},
+        "language_id": language_id.stats(),
+        "translation_cache": translation_cache.stats(),
+        "audio_store": audio_store.stats(),
+        "conversations": conversation_store.stats(),
+        "decoding": {
+            "translation_preset": DECODING_PRESET,
+            "chat_preset": CHAT_DECODING_PRESET,
+            "translation_seconds_per_token": translation_latency.seconds_per_token,
+            "chat_seconds_per_token": chat_latency.seconds_per_token,
+        },
+    })
+
+@app.route('/debug/threads')
+def debug_threads():
+    """
+    Returns JSON with this worker's thread plan (see thread_plan.py): its CPUs
+    and torch thread counts, as planned and as currently set.
+    """
+    return jsonify(thread_plan.current())
+
+# With an inference server the models live there, not in the HTTP workers
+if os.environ.get("MODEL_WARMUP") == "1" and not INFERENCE_SOCKET:
+    models.warmup()
+
+def count_chat_tokens(text):
+    return inference.count_tokens(text)
+
+# Conversation history per browser session, trimmed to a token budget so the
+# prompt (and generation latency) stays bounded. CONVERSATION_DB shares it between workers.
+conversation_store = open_store(
+    count_chat_tokens,
+    db_path=os.environ.get("CONVERSATION_DB"),
+    max_tokens=int(os.environ.get("MAX_HISTORY_TOKENS", 1024)),
+    max_sessions=int(os.environ.get("MAX_SESSIONS", 1000)),
+)
+
+def conversation_id():
+    """The id of the current browser session's conversation."""
+    if "conversation_id" not in session:
+        session["conversation_id"] = uuid.uuid4().hex
+    return session["conversation_id"]
+
+def chat_decoding(preset, budget_ms, streaming):
+    """generate() kwargs for a chat request (the streamer doesn't support beam search)."""
+    kwargs = decoding_kwargs(CHAT_PRESETS, preset or CHAT_DECODING_PRESET, budget_ms, chat_latency)
+    if streaming:
+        kwargs["num_beams"] = 1
+    return kwargs
+
+def chat_prompt(conv_id):
+    """The conversation so far as one prompt, ending with the assistant's turn."""
+    # A simple approach: join all messages into a single string, 
+    # but for real multi-turn chat, you’d want a more robust approach
+    full_context = ""
+    for msg in conversation_store.messages(conv_id):
+        if msg["role"] == "user":
+            full_context += f"User: {msg['content']}\n"
+        else:  # assistant
+            full_context += f"AI: {msg['content']}\n"
+    return full_context + "AI: "
 
 @app.route('/chat', methods=['GET', 'POST'])
 def chat():
-    global conversation_history
     error = None
+    conv_id = conversation_id()
 
     if request.method == 'POST':
         user_prompt = request.form.get('prompt', '').strip()
         if not user_prompt:
             error = "Please enter a prompt."
         else:
-            # 1) Add user's prompt to conversation
-            conversation_history.append({"role": "user", "content": user_prompt})
+            try:
+                decoding = chat_decoding(
+                    request.form.get('preset'), parse_budget(request.form.get('latency_budget_ms')), wants_stream(request)
+                )
+                # 1) Add user's prompt to conversation (old turns beyond the token budget are dropped)
+                conversation_store.append(conv_id, "user", user_prompt)
+            except (ValueError, ModelNotEnabled, InferenceError) as e:
+                return render_template("tikgpt.html", conversation=conversation_store.messages(conv_id), error=str(e))
 
             # 2) Prepare input for GPT
-            # A simple approach: join all messages into a single string, 
-            # but for real multi-turn chat, you’d want a more robust approach
-            full_context = ""
-            for msg in conversation_history:
-                if msg["role"] == "user":
-                    full_context += f"User: {msg['content']}\n"
-                else:  # assistant
-                    full_context += f"AI: {msg['content']}\n"
-            full_context += "AI: "
-
-            # 3) Generate the model output
-            inputs = tokenizer_gpt.encode(full_context, return_tensors='pt')
-            # Adjust max_length, temperature, top_k, etc. as needed
-            outputs = model_gpt.generate(
-                inputs, 
-                max_length=len(inputs[0]) + 50, 
-                num_return_sequences=1,
-                do_sample=True,  # For creative generation
-                temperature=0.9,
-                top_p=0.9,
-                pad_token_id=tokenizer_gpt.eos_token_id
-            )
+            full_context = chat_prompt(conv_id)
+
+            # 3) Generate the model output. Greedy/sampling/beam and output length come
+            # from the decoding preset (see decoding.py); the cached key/values of the
+            # conversation's earlier turns are reused (see chat_model.py)
+
+            # Streaming clients get the answer token by token (Server-Sent Events)
+            if wants_stream(request):
+                def on_complete(answer):
+                    conversation_store.append(conv_id, "assistant", answer.strip())
+
+                return sse_response(sse_stream(inference.stream_text(full_context, decoding, conv_id), on_complete))
+
             # Decode and extract the new text the model appended
-            generated_text = tokenizer_gpt.decode(outputs[0], skip_special_tokens=True)
+            generated_text = inference.generate_text(full_context, decoding, conv_id)
 
             # We only want the new portion after "AI: "
             # A simplistic approach:
             answer = generated_text.split("AI:")[-1].strip()
 
             # 4) Add the model's response to the conversation
-            conversation_history.append({"role": "assistant", "content": answer})
+            conversation_store.append(conv_id, "assistant", answer)
 
             return redirect(url_for('chat'))
 
     # Render the chat template with existing conversation
-    return render_template("tikgpt.html", conversation=conversation_history, error=error)
+    return render_template("tikgpt.html", conversation=conversation_store.messages(conv_id), error=error)
 
 @app.route('/api-chat', methods=['POST'])
 def chatapi():
     """
     Endpoint that generates text using GPT-2.
-    Expects a JSON body: {"prompt": "..."}
+    Expects a JSON body: {"prompt": "...", "stream": false, "preset": "balanced", "latency_budget_ms": 500}
+    ("preset" and "latency_budget_ms" are optional)
     Returns JSON: {"response": "... GPT-2 output ..."}
+    With "stream": true (or Accept: text/event-stream) the continuation is sent
+    as Server-Sent Events: {"token": "..."} per chunk, then {"done": true, "response": "..."}
     """
     data = request.get_json()
     prompt = data.get('prompt', '').strip()
@@ -161,30 +632,27 @@ def chatapi():
     if not prompt:
         return jsonify({"error": "No prompt provided"}), 400
 
-    # 2) Encode the prompt
-    input_ids = tokenizer_gpt.encode(prompt, return_tensors='pt')
-    
-    # If you're using GPU, move the input to CUDA:
-    # input_ids = input_ids.to("cuda")
-
-    # 3) Generate text
-    # Adjust parameters as desired:
-    # - max_length: total tokens for input + output
-    # - temperature: how "creative" the model is
-    # - top_p, top_k, etc. for nucleus or top-k sampling
-    output_ids = model_gpt.generate(
-        input_ids,
-        max_length=len(input_ids[0]) + 50,  # e.g. prompt length + 50 tokens
-        num_return_sequences=1,
-        do_sample=True,      # for sampling (creative) 
-        top_p=0.9,           # nucleus sampling
-        temperature=0.9,     # creativity
-        # top_k=50,          # if you want top-k
-        pad_token_id=tokenizer_gpt.eos_token_id  # avoid errors with GPT-2
-    )
+    try:
+        decoding = chat_decoding(data.get('preset'), parse_budget(data.get('latency_budget_ms')), wants_stream(request))
+    except ValueError as e:
+        return jsonify({"error": str(e)}), 400
+
+    # 2) Generate text
+    # max_new_tokens, sampling (temperature, top_p) or beam search come from
+    # the decoding preset, capped by the latency budget (see decoding.py)
 
-    # 4) Decode the generated tokens
-    generated_text = tokenizer_gpt.decode(output_ids[0], skip_special_tokens=True)
+    # Stream the continuation as it is generated
+    if wants_stream(request):
+        try:
+            chunks = inference.stream_text(prompt, decoding)
+        except (ModelNotEnabled, InferenceError) as e:
+            return jsonify({"error": str(e)}), 503
+        return sse_response(sse_stream(chunks))
+
+    try:
+        generated_text = inference.generate_text(prompt, decoding)
+    except (ModelNotEnabled, InferenceError) as e:
+        return jsonify({"error": str(e)}), 503
 
     # (Optional) If you want to remove the original prompt part from the response,
     # you can do something like:
@@ -192,12 +660,10 @@ def chatapi():
 
     ai_reply = generated_text  # The full prompt + continuation
 
-    # 5) Return the AI’s response in JSON
+    # 3) Return the AI’s response in JSON
     return jsonify({"response": ai_reply})
 
-
 if __name__ == '__main__':
-    # Make sure there's a 'static' folder to save MP3 files
-    if not os.path.exists("static"):
-        os.makedirs("static")
-    app.run(debug=True)
+    # gunicorn with gunicorn.conf.py (FLASK_DEBUG=1: Flask's development server), see serve.py
+    from serve import run
+    run(app, warmup=None if INFERENCE_SOCKET else models.warmup)
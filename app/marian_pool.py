@@ -0,0 +1,116 @@
+import threading
+import time
+from collections import OrderedDict
+
+from model_registry import weight_bytes
+
+# Dedicated Marian (opus-mt) model for each (source, target) pair, with the
+# target-language token that multi-target models expect in front of the text.
+# Pairs missing here have no good Marian model and are served by M2M100.
+MARIAN_MODELS = {}
+for _lang in ("fr", "es", "de", "it", "ru", "zh", "ar"):
+    MARIAN_MODELS[("en", _lang)] = (f"Helsinki-NLP/opus-mt-en-{_lang}", None)
+for _lang in ("fr", "es", "de", "it", "ru", "zh", "ar", "ja"):
+    MARIAN_MODELS[(_lang, "en")] = (f"Helsinki-NLP/opus-mt-{_lang}-en", None)
+for _src, _tgt in (("fr", "de"), ("de", "fr"), ("fr", "es"), ("es", "fr"), ("es", "de"), ("de", "es")):
+    MARIAN_MODELS[(_src, _tgt)] = (f"Helsinki-NLP/opus-mt-{_src}-{_tgt}", None)
+# en-zh and en-ar cover several target languages/scripts as well
+MARIAN_MODELS[("en", "zh")] = ("Helsinki-NLP/opus-mt-en-zh", ">>cmn_Hans<<")
+MARIAN_MODELS[("en", "ar")] = ("Helsinki-NLP/opus-mt-en-ar", ">>ara<<")
+MARIAN_MODELS[("en", "pt")] = ("Helsinki-NLP/opus-mt-en-ROMANCE", ">>pt<<")
+MARIAN_MODELS[("pt", "en")] = ("Helsinki-NLP/opus-mt-ROMANCE-en", None)
+
+
+class MarianPool:
+    """
+    Loads Marian pair models on demand and keeps the most recently used ones
+    resident, within `max_bytes` of weights (the least recently used model is
+    dropped first; the one just loaded always stays).
+    """
+
+    def __init__(self, max_bytes=1024 * 1024 * 1024, quantization="fp32", models=None):
+        self.max_bytes = max_bytes
+        self.quantization = quantization
+        self.models = MARIAN_MODELS if models is None else models
+        self._resident = OrderedDict()  # model name -> (tokenizer, model, bytes)
+        self._lock = threading.Lock()
+        self._load_locks = {}
+        self.loads = 0
+        self.evictions = 0
+        self.hits = 0
+        self.load_seconds = 0.0
+
+    def supports(self, source_lang, target_lang):
+        return (source_lang, target_lang) in self.models
+
+    def _load(self, name):
+        # Imported here, so MARIAN_MODELS can be used without torch
+        from transformers import MarianMTModel, MarianTokenizer
+
+        from quantization import quantize
+
+        start = time.perf_counter()
+        tokenizer = MarianTokenizer.from_pretrained(name)
+        model = quantize(MarianMTModel.from_pretrained(name), self.quantization)
+        entry = (tokenizer, model, weight_bytes(model))
+        with self._lock:
+            self._resident[name] = entry
+            self.loads += 1
+            self.load_seconds += time.perf_counter() - start
+            # Evict least recently used models until the pool fits again
+            while len(self._resident) > 1 and self.resident_bytes() > self.max_bytes:
+                self._resident.popitem(last=False)
+                self.evictions += 1
+        return entry
+
+    def get(self, source_lang, target_lang):
+        """The (tokenizer, model, prefix) for a supported pair, loading it if needed."""
+        name, prefix = self.models[(source_lang, target_lang)]
+        with self._lock:
+            if name in self._resident:
+                self._resident.move_to_end(name)
+                self.hits += 1
+                tokenizer, model, _ = self._resident[name]
+                return tokenizer, model, prefix
+            load_lock = self._load_locks.setdefault(name, threading.Lock())
+        # Only one thread loads a given model; the others wait for it
+        with load_lock:
+            with self._lock:
+                entry = self._resident.get(name)
+            if entry is None:
+                entry = self._load(name)
+        tokenizer, model, _ = entry
+        return tokenizer, model, prefix
+
+    def translate(self, texts, source_lang, target_lang, generate_kwargs=None, latency_model=None):
+        """
+        Translate a list of texts with the pair's Marian model, as one padded
+        batch. The measured cost per token is fed to `latency_model`.
+        """
+        generate_kwargs = generate_kwargs or {}
+        tokenizer, model, prefix = self.get(source_lang, target_lang)
+        if prefix:
+            texts = [f"{prefix} {text}" for text in texts]
+        encoded = tokenizer(texts, return_tensors="pt", padding=True, truncation=True)
+        start = time.perf_counter()
+        generated_tokens = model.generate(**encoded, **generate_kwargs)
+        if latency_model is not None:
+            latency_model.observe(
+                time.perf_counter() - start, generated_tokens.shape[1], generate_kwargs.get("num_beams", 1)
+            )
+        return tokenizer.batch_decode(generated_tokens, skip_special_tokens=True)
+
+    def resident_bytes(self):
+        return sum(entry[2] for entry in self._resident.values())
+
+    def stats(self):
+        with self._lock:
+            return {
+                "resident": list(self._resident),
+                "resident_bytes": self.resident_bytes(),
+                "max_bytes": self.max_bytes,
+                "loads": self.loads,
+                "hits": self.hits,
+                "evictions": self.evictions,
+                "load_seconds": self.load_seconds,
+            }
@@ -0,0 +1,103 @@
+import os
+import threading
+import time
+
+
+class ModelNotEnabled(RuntimeError):
+    """Raised when a request needs a model that this deployment has disabled."""
+
+
+def rss_bytes():
+    """Resident set size of the current process (Linux), or 0 if unknown."""
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError, IndexError):
+        return 0
+
+
+def weight_bytes(obj):
+    """Size of the parameters and buffers of every torch module found in `obj`."""
+    if isinstance(obj, dict):
+        return sum(weight_bytes(value) for value in obj.values())
+    if isinstance(obj, (list, tuple)):
+        return sum(weight_bytes(value) for value in obj)
+    if hasattr(obj, "parameters") and hasattr(obj, "buffers"):
+        tensors = list(obj.parameters()) + list(obj.buffers())
+        return sum(t.numel() * t.element_size() for t in tensors)
+    if hasattr(obj, "model"):  # e.g. a transformers pipeline
+        return weight_bytes(obj.model)
+    return 0
+
+
+class ModelRegistry:
+    """
+    Loads models lazily, on first use.
+
+    Each model is registered under a short name with a loader function; the
+    loader runs the first time `get(name)` is called (once, even with many
+    threads waiting). `enabled` restricts which names may be loaded in this
+    deployment, and `stats()` reports load time and memory per model.
+    """
+
+    def __init__(self, enabled=None):
+        self.enabled = set(enabled) if enabled is not None else None
+        self._loaders = {}
+        self._models = {}
+        self._info = {}
+        self._locks = {}
+        self._lock = threading.Lock()
+
+    @classmethod
+    def from_env(cls):
+        """A registry restricted to the comma-separated ENABLED_MODELS (all models if unset)."""
+        enabled = os.environ.get("ENABLED_MODELS")
+        return cls(enabled=[name.strip() for name in enabled.split(",")] if enabled else None)
+
+    def register(self, name, loader):
+        self._loaders[name] = loader
+        self._locks[name] = threading.Lock()
+
+    def allows(self, name):
+        """Whether the deployment enables `name`, registered here or not (e.g. in an inference server)."""
+        return self.enabled is None or name in self.enabled
+
+    def is_enabled(self, name):
+        return name in self._loaders and self.allows(name)
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def get(self, name):
+        """Return the loaded model object for `name`, loading it if needed."""
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        if not self.is_enabled(name):
+            raise ModelNotEnabled(f"Model '{name}' is not enabled in this deployment.")
+
+        with self._locks[name]:
+            model = self._models.get(name)
+            if model is None:
+                rss_before = rss_bytes()
+                start = time.perf_counter()
+                model = self._loaders[name]()
+                self._info[name] = {
+                    "load_seconds": round(time.perf_counter() - start, 3),
+                    "weight_bytes": weight_bytes(model),
+                    "rss_delta_bytes": rss_bytes() - rss_before,
+                }
+                self._models[name] = model
+        return model
+
+    def warmup(self, names=None):
+        """Load the given (or all enabled) models up front."""
+        for name in names or self._loaders:
+            if self.is_enabled(name):
+                self.get(name)
+
+    def stats(self):
+        return {
+            name: dict(loaded=name in self._models, enabled=self.is_enabled(name), **self._info.get(name, {}))
+            for name in self._loaders
+        }
@@ -0,0 +1,43 @@
+import io
+
+import torch
+
+MODES = ("fp32", "int8", "bf16")
+
+
+def conv1d_to_linear(model):
+    """
+    Replace the transformers `Conv1D` layers used by GPT-2 with equivalent
+    `nn.Linear` layers, so dynamic quantization picks them up as well.
+    """
+    for module in list(model.modules()):
+        for child_name, child in list(module.named_children()):
+            if type(child).__name__ == "Conv1D":
+                in_features, out_features = child.weight.shape
+                linear = torch.nn.Linear(in_features, out_features)
+                linear.weight.data = child.weight.data.T.contiguous()
+                linear.bias.data = child.bias.data
+                setattr(module, child_name, linear)
+    return model
+
+
+def quantize(model, mode):
+    """
+    Return `model` prepared for CPU inference in the given mode:
+    'fp32' (unchanged), 'int8' (dynamic int8 Linear layers) or 'bf16'.
+    """
+    if mode == "fp32":
+        return model
+    if mode == "int8":
+        model = conv1d_to_linear(model)
+        return torch.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+    if mode == "bf16":
+        return model.to(torch.bfloat16)
+    raise ValueError(f"Unknown quantization mode '{mode}'. Choose one of: {', '.join(MODES)}")
+
+
+def serialized_bytes(model):
+    """Size of the model's state dict (this also counts packed int8 weights)."""
+    buffer = io.BytesIO()
+    torch.save(model.state_dict(), buffer)
+    return buffer.tell()
@@ -0,0 +1,144 @@
+import threading
+from concurrent.futures import Future
+
+from decoding import LatencyModel
+
+
+class RoutePlanner:
+    """
+    Chooses how to translate a language pair with the available backends.
+
+    `backends` maps a backend name to a function telling whether it covers a
+    (source, target) pair. A route is a list of legs (backend, source, target):
+    either one direct leg, or two legs through the `pivot` language. Every
+    backend has a LatencyModel with its measured cost per token, and `plan()`
+    returns the route with the lowest total cost (the legs have roughly the
+    same number of tokens, so their costs per token add up).
+    """
+
+    def __init__(self, backends, latency_models=None, pivot="en"):
+        self.backends = backends
+        self.latency = dict(latency_models or {})
+        for name in backends:
+            self.latency.setdefault(name, LatencyModel())
+        self.pivot = pivot
+        self._lock = threading.Lock()
+        self.planned = {"direct": 0, "pivot": 0}
+
+    def covers(self, backend, source_lang, target_lang):
+        return self.backends[backend](source_lang, target_lang)
+
+    def routes(self, source_lang, target_lang, allowed=None):
+        """Every direct and pivot route for the pair, using only the `allowed` backends."""
+        names = [name for name in self.backends if allowed is None or name in allowed]
+        routes = [[(name, source_lang, target_lang)] for name in names if self.covers(name, source_lang, target_lang)]
+        if self.pivot not in (source_lang, target_lang):
+            for first in names:
+                if not self.covers(first, source_lang, self.pivot):
+                    continue
+                for second in names:
+                    if self.covers(second, self.pivot, target_lang):
+                        routes.append([(first, source_lang, self.pivot), (second, self.pivot, target_lang)])
+        return routes
+
+    def cost(self, route):
+        """Estimated seconds per token of a route."""
+        return sum(self.latency[backend].seconds_per_token for backend, _, _ in route)
+
+    def plan(self, source_lang, target_lang, allowed=None):
+        routes = self.routes(source_lang, target_lang, allowed)
+        if not routes:
+            raise ValueError(f"No route for {source_lang}->{target_lang}.")
+        route = min(routes, key=self.cost)
+        with self._lock:
+            self.planned["direct" if len(route) == 1 else "pivot"] += 1
+        return route
+
+    def stats(self):
+        return {
+            "pivot": self.pivot,
+            "planned": dict(self.planned),
+            "seconds_per_token": {name: model.seconds_per_token for name, model in self.latency.items()},
+        }
+
+
+def _forward(source, target):
+    """Copy the outcome of one future into another (unless it was cancelled)."""
+    if not target.set_running_or_notify_cancel():
+        return
+    if source.exception() is not None:
+        target.set_exception(source.exception())
+    else:
+        target.set_result(source.result())
+
+
+class RouteRunner:
+    """
+    Queues texts along planned routes with `submit(text, source, target, backend, *key)`
+    (e.g. MicroBatcher.submit), so both legs of a pivot route are batched with
+    the rest of the traffic.
+
+    The intermediate (pivot) translation is cached in `cache` (a
+    TranslationCache, with `key` as the variant) and shared while in flight,
+    so translating one text into several targets runs the first leg only once.
+    """
+
+    def __init__(self, submit, cache=None):
+        self.submit_leg = submit
+        self.cache = cache
+        self._inflight = {}
+        self._lock = threading.Lock()
+        self.shared = 0
+
+    def submit(self, text, route, *key, cache_results=True):
+        """Queue `text` along `route` and return a Future with the final translation."""
+        if len(route) == 1:
+            backend, source_lang, target_lang = route[0]
+            return self.submit_leg(text, source_lang, target_lang, backend, *key)
+
+        (first_backend, source_lang, pivot_lang), (second_backend, _, target_lang) = route
+        result = Future()
+
+        def second_leg(first):
+            if result.cancelled():
+                return
+            if first.exception() is not None:
+                _forward(first, result)
+                return
+            leg = self.submit_leg(first.result(), pivot_lang, target_lang, second_backend, *key)
+            leg.add_done_callback(lambda done: _forward(done, result))
+
+        pivot_text = self.cache.get(text, source_lang, pivot_lang, key) if self.cache is not None else None
+        if pivot_text is not None:
+            first = Future()
+            first.set_result(pivot_text)
+        else:
+            first = self._first_leg(text, source_lang, pivot_lang, first_backend, key, cache_results)
+        first.add_done_callback(second_leg)
+        return result
+
+    def _first_leg(self, text, source_lang, pivot_lang, backend, key, cache_results):
+        inflight_key = (text, source_lang, pivot_lang, backend) + tuple(key)
+        with self._lock:
+            first = self._inflight.get(inflight_key)
+            if first is not None:
+                self.shared += 1
+                return first
+            first = self.submit_leg(text, source_lang, pivot_lang, backend, *key)
+            self._inflight[inflight_key] = first
+
+        def finished(done):
+            with self._lock:
+                self._inflight.pop(inflight_key, None)
+            if cache_results and self.cache is not None and done.exception() is None:
+                self.cache.set(text, source_lang, pivot_lang, done.result(), key)
+
+        first.add_done_callback(finished)
+        return first
+
+    def stats(self):
+        return {
+            "in_flight": len(self._inflight),
+            "shared_first_legs": self.shared,
+            "pivot_cache": self.cache.stats() if self.cache is not None else None,
+        }
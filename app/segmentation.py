@@ -0,0 +1,64 @@
+import re
+
+# End of a sentence: terminal punctuation followed by whitespace, CJK
+# full-width punctuation (no space needed), or a line break
+BOUNDARY_RE = re.compile(r"(?<=[.!?…؟])\s+|(?<=[。！？])\s*|\s*\n\s*")
+
+# Languages written without spaces between sentences
+NO_SPACE_LANGUAGES = {"zh", "ja"}
+
+
+def split_long(sentence, max_chars):
+    """Cut a sentence longer than `max_chars` at commas or spaces (or hard, as a last resort)."""
+    pieces = []
+    while len(sentence) > max_chars:
+        window = sentence[:max_chars]
+        cut = max(window.rfind(", "), window.rfind("، "), window.rfind("，"))
+        if cut <= 0:
+            cut = window.rfind(" ")
+        cut = cut + 1 if cut > 0 else max_chars
+        pieces.append(sentence[:cut].strip())
+        sentence = sentence[cut:].strip()
+    if sentence:
+        pieces.append(sentence)
+    return pieces
+
+
+def split_sentences(text, max_chars=400):
+    """
+    Split `text` into sentences of at most `max_chars` characters.
+
+    Returns a list of (sentence, separator) pairs, where the separator is the
+    whitespace that followed the sentence in the input ('' for the last one,
+    or between the pieces of a sentence that had to be cut).
+    """
+    segments = []
+    start = 0
+    for match in BOUNDARY_RE.finditer(text):
+        if match.end() == start and not match.group():
+            continue
+        sentence = text[start:match.start()].strip()
+        if sentence:
+            pieces = split_long(sentence, max_chars)
+            segments.extend((piece, " ") for piece in pieces[:-1])
+            segments.append((pieces[-1], match.group()))
+        start = match.end()
+    sentence = text[start:].strip()
+    if sentence:
+        pieces = split_long(sentence, max_chars)
+        segments.extend((piece, " ") for piece in pieces[:-1])
+        segments.append((pieces[-1], ""))
+    if segments:
+        segments[-1] = (segments[-1][0], "")
+    return segments
+
+
+def join_sentences(translations, separators, target_lang):
+    """Reassemble translated sentences, keeping the input's line breaks."""
+    space = "" if target_lang in NO_SPACE_LANGUAGES else " "
+    parts = []
+    for i, (translation, separator) in enumerate(zip(translations, separators)):
+        parts.append(translation)
+        if i < len(translations) - 1:
+            parts.append("\n" * separator.count("\n") if "\n" in separator else space)
+    return "".join(parts)
@@ -0,0 +1,59 @@
+"""
+Production entry point: serves an already imported app with gunicorn and
+the settings of gunicorn.conf.py.
+
+    cd app && python main.py --workers 4 --threads 8
+    cd app && python asgi.py --workers 2
+
+gunicorn's command line options may be passed after the script name and
+override gunicorn.conf.py (e.g. --bind, --workers, --threads, --timeout).
+FLASK_DEBUG=1 runs Flask's development server instead (single process,
+without the reloader, which would load the models twice).
+
+Send SIGHUP to the master to reload gracefully: with preloading, the new
+workers are forked from the master and share its models, nothing is loaded
+or downloaded again.
+"""
+import os
+
+from gunicorn.app.base import Application
+
+CONFIG_FILE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "gunicorn.conf.py")
+
+
+class PreloadedApplication(Application):
+    """A gunicorn application for an app object that is already imported."""
+
+    def __init__(self, application, warmup=None, options=None):
+        self.application = application
+        self.warmup = warmup
+        self.options = options or {}
+        super().__init__()
+
+    def init(self, parser, opts, args):
+        # gunicorn.conf.py next to this file, unless -c/--config is given
+        opts.config = opts.config or CONFIG_FILE
+
+    def load_config(self):
+        super().load_config()
+        # Settings passed to run() (e.g. the worker class) win over the config file
+        for key, value in self.options.items():
+            self.cfg.set(key, value)
+
+    def load(self):
+        # Called once in the master when preload_app is set (then the workers
+        # are forked with the models loaded), otherwise in every worker
+        if self.cfg.preload_app and self.warmup is not None:
+            self.warmup()
+        return self.application
+
+
+def run(application, warmup=None, **options):
+    """
+    Serve `application` (WSGI, or ASGI with worker_class="uvicorn.workers.UvicornWorker").
+    `warmup` loads the models; it is called before forking the workers when preloading.
+    """
+    if os.environ.get("FLASK_DEBUG") == "1" and hasattr(application, "run"):
+        application.run(debug=True, use_reloader=False)
+        return
+    PreloadedApplication(application, warmup, options).run()
@@ -0,0 +1,73 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from fork_safe import ForkGuard
+
+
+class SpeechService:
+    """
+    Runs TTS synthesis on a worker pool so the translation response does not
+    wait for speech.
+
+    `request()` returns the audio URL straight away; the file appears in the
+    audio store once the backend has finished, and `status()` reports
+    'ready', 'pending' or 'failed' for it. The state is kept in the store's
+    directory, so any gunicorn worker can answer for a synthesis started by another.
+    """
+
+    def __init__(self, store, backend, max_workers=4):
+        self.store = store
+        self.backend = backend
+        self.max_workers = max_workers
+        self._lock = threading.Lock()
+        self._pending = {}  # filename -> Future
+        self._executor = None
+        self._process = ForkGuard()
+
+    def _pool(self):
+        # Created lazily, see fork_safe.py
+        with self._lock:
+            if self._process.new_process():
+                self._executor = ThreadPoolExecutor(self.max_workers, thread_name_prefix="tts")
+                self._pending = {}
+            return self._executor
+
+    def request(self, text, lang):
+        """Return (url, status) for the speech of `text`, scheduling synthesis if needed."""
+        url = self.store.lookup(text, lang, self.backend.name, count_hit=True)
+        if url is not None:
+            return url, "ready"
+
+        filename = self.store.filename_for(text, lang, self.backend.name)
+        pool = self._pool()
+        with self._lock:
+            future = self._pending.get(filename)
+            if future is None or future.done():
+                self.store.set_state(filename, "pending")
+                self._pending[filename] = pool.submit(self._synthesize, text, lang, filename)
+        return self.store.url_for(filename), "pending"
+
+    def _synthesize(self, text, lang, filename):
+        try:
+            url = self.store.get_or_create(text, lang, self.backend.synthesize, self.backend.name)
+        except Exception:
+            self.store.set_state(filename, "failed")
+            raise
+        self.store.set_state(filename, None)
+        return url
+
+    def synthesize(self, text, lang):
+        """Blocking variant: synthesize (or reuse) and return the URL."""
+        return self.store.get_or_create(text, lang, self.backend.synthesize, self.backend.name)
+
+    def status(self, filename):
+        """Return 'ready', 'pending', 'failed' or 'missing' for a stored file name."""
+        with self._lock:
+            future = self._pending.get(filename)
+        if future is not None and not future.done():
+            return "pending"
+        state = self.store.state(filename)
+        if state == "ready":
+            with self._lock:
+                self._pending.pop(filename, None)
+        return state
@@ -0,0 +1,77 @@
+import json
+import threading
+
+from flask import Response, stream_with_context
+
+
+def stream_generation(tokenizer, run, timeout=None):
+    """
+    Yield text chunks while a generation is still running.
+
+    `run(streamer)` must start the actual generation (e.g. `model.generate(...,
+    streamer=streamer)` or a pipeline call); it is executed on a background
+    thread and the decoded text is yielded as soon as the streamer emits it.
+    Errors raised by the generation are re-raised here once the stream ends.
+    """
+    # Imported here: HTTP workers of an inference server only use the SSE helpers
+    from transformers import TextIteratorStreamer
+
+    streamer = TextIteratorStreamer(tokenizer, skip_prompt=True, skip_special_tokens=True, timeout=timeout)
+    errors = []
+
+    def target():
+        try:
+            run(streamer)
+        except Exception as e:
+            errors.append(e)
+            streamer.end()
+
+    thread = threading.Thread(target=target, name="generate-stream", daemon=True)
+    thread.start()
+    for text in streamer:
+        if text:
+            yield text
+    thread.join()
+    if errors:
+        raise errors[0]
+
+
+def sse_event(payload):
+    """Format a JSON payload as one Server-Sent Events message."""
+    return f"data: {json.dumps(payload)}\n\n"
+
+
+def sse_stream(chunks, on_complete=None):
+    """
+    Turn text chunks into SSE events: {"token": ...} for every chunk, then
+    {"done": true, "response": <full text>} (or {"error": ...} on failure).
+    """
+    parts = []
+    try:
+        for chunk in chunks:
+            parts.append(chunk)
+            yield sse_event({"token": chunk})
+    except Exception as e:
+        yield sse_event({"error": str(e)})
+        return
+    text = "".join(parts)
+    if on_complete is not None:
+        on_complete(text)
+    yield sse_event({"done": True, "response": text})
+
+
+def sse_response(events):
+    """Wrap an SSE generator in an unbuffered streaming Flask response."""
+    return Response(
+        stream_with_context(events),
+        mimetype="text/event-stream",
+        headers={"Cache-Control": "no-cache", "X-Accel-Buffering": "no"},
+    )
+
+
+def wants_stream(request):
+    """True if the client asked for a streamed (text/event-stream) response."""
+    if request.accept_mimetypes.best == "text/event-stream":
+        return True
+    data = request.get_json(silent=True) or {}
+    return bool(data.get("stream")) or request.form.get("stream") == "1"
@@ -0,0 +1,113 @@
+import threading
+import time
+from concurrent.futures import CancelledError, ThreadPoolExecutor
+
+import pytest
+
+from batching import MicroBatcher
+
+
+def upper(texts, source_lang, target_lang):
+    return [f"{source_lang}>{target_lang}:{text.upper()}" for text in texts]
+
+
+def test_translate():
+    batcher = MicroBatcher(upper)
+    assert batcher.translate("hello", "en", "fr", timeout=5) == "en>fr:HELLO"
+
+
+def test_concurrent_requests_share_batches_per_key():
+    calls = []
+
+    def translate(texts, *key):
+        calls.append((key, list(texts)))
+        return upper(texts, *key)
+
+    batcher = MicroBatcher(translate, max_batch_size=32, max_wait_ms=200)
+    requests = [(f"text {i}", "en", "fr" if i % 2 else "de") for i in range(20)]
+    with ThreadPoolExecutor(20) as pool:
+        results = list(pool.map(lambda request: batcher.translate(*request, timeout=5), requests))
+
+    assert results == [upper([text], *key)[0] for text, *key in requests]
+    # Every call holds a single key, and there are far fewer calls than requests
+    assert {key for key, _ in calls} == {("en", "fr"), ("en", "de")}
+    assert len(calls) < len(requests)
+    assert sum(len(texts) for _, texts in calls) == len(requests)
+    assert batcher.stats()["items"] == len(requests)
+
+
+def test_batches_are_capped_at_max_batch_size():
+    sizes = []
+
+    def translate(texts, *key):
+        sizes.append(len(texts))
+        return list(texts)
+
+    batcher = MicroBatcher(translate, max_batch_size=4, max_wait_ms=200)
+    futures = [batcher.submit(str(i), "en", "fr") for i in range(10)]
+    assert [future.result(timeout=5) for future in futures] == [str(i) for i in range(10)]
+    assert max(sizes) <= 4
+
+
+def test_error_fails_only_its_group():
+    def translate(texts, source_lang, target_lang):
+        if target_lang == "xx":
+            raise RuntimeError("unsupported")
+        return list(texts)
+
+    batcher = MicroBatcher(translate, max_wait_ms=200)
+    bad = batcher.submit("a", "en", "xx")
+    good = batcher.submit("b", "en", "fr")
+    with pytest.raises(RuntimeError, match="unsupported"):
+        bad.result(timeout=5)
+    assert good.result(timeout=5) == "b"
+    # The worker survives the error
+    assert batcher.translate("c", "en", "fr", timeout=5) == "c"
+
+
+@pytest.mark.parametrize("results", [[], ["only one"], ["one", "two", "three"]])
+def test_wrong_number_of_results_fails_the_group(results):
+    batcher = MicroBatcher(lambda texts, *key: results, max_wait_ms=200)
+    futures = [batcher.submit(text, "en", "fr") for text in ("a", "b")]
+    for future in futures:
+        with pytest.raises(RuntimeError, match="results for 2 texts"):
+            future.result(timeout=5)
+
+
+def test_cancelled_futures_are_skipped():
+    seen = []
+    started = threading.Event()
+    release = threading.Event()
+
+    def translate(texts, *key):
+        seen.extend(texts)
+        started.set()
+        release.wait(5)
+        return list(texts)
+
+    batcher = MicroBatcher(translate, max_batch_size=1, max_wait_ms=0)
+    first = batcher.submit("first", "en", "fr")
+    assert started.wait(5)
+    # Queued behind the running batch, then cancelled by its caller
+    cancelled = batcher.submit("cancelled", "en", "fr")
+    assert cancelled.cancel()
+    release.set()
+
+    assert first.result(timeout=5) == "first"
+    assert batcher.translate("after", "en", "fr", timeout=5) == "after"
+    with pytest.raises(CancelledError):
+        cancelled.result()
+    assert seen == ["first", "after"]
+
+
+def test_pending_counts_queued_items():
+    release = threading.Event()
+    batcher = MicroBatcher(lambda texts, *key: release.wait(5) and list(texts), max_batch_size=1, max_wait_ms=0)
+    futures = [batcher.submit(str(i), "en", "fr") for i in range(3)]
+    deadline = time.monotonic() + 5
+    while batcher.pending() != 2 and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert batcher.pending() == 2
+    release.set()
+    assert [future.result(timeout=5) for future in futures] == ["0", "1", "2"]
+    assert batcher.pending() == 0
@@ -0,0 +1,20 @@
+from bucketing import PaddingStats, length_buckets
+
+
+def test_buckets_cover_every_item_and_bound_padding():
+    lengths = [5, 100, 6, 90, 7, 50, 8]
+    buckets = length_buckets(lengths, max_batch_size=3, max_ratio=2.0)
+    assert sorted(i for bucket in buckets for i in bucket) == list(range(len(lengths)))
+    for bucket in buckets:
+        assert len(bucket) <= 3
+        assert max(lengths[i] for i in bucket) <= 2.0 * min(lengths[i] for i in bucket)
+
+
+def test_padding_stats():
+    stats = PaddingStats()
+    assert stats.record([2, 4]) == 0.25
+    other = PaddingStats()
+    other.record([3, 3])
+    stats.merge(other)
+    assert stats.stats()["real_tokens"] == 12
+    assert stats.stats()["padded_tokens"] == 14
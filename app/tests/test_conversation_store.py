@@ -0,0 +1,60 @@
+import pytest
+
+from conversation_store import ConversationStore, SQLiteConversationStore, open_store
+
+
+def count_words(text):
+    return len(text.split())
+
+
+@pytest.fixture(params=["memory", "sqlite"])
+def make_store(request, tmp_path):
+    def make(**kwargs):
+        db_path = str(tmp_path / "conversations.db") if request.param == "sqlite" else None
+        return open_store(count_words, db_path=db_path, **kwargs)
+    return make
+
+
+def test_open_store_picks_the_backend(tmp_path):
+    assert type(open_store(count_words)) is ConversationStore
+    assert isinstance(open_store(count_words, db_path=str(tmp_path / "c.db")), SQLiteConversationStore)
+
+
+def test_oldest_messages_are_dropped_beyond_the_token_budget(make_store):
+    store = make_store(max_tokens=10)
+    store.append("s", "user", "one two three")         # 4 tokens with the role
+    store.append("s", "assistant", "four five six")    # 4
+    store.append("s", "user", "seven eight nine")      # 4: over budget, the first message goes
+    assert [m["content"] for m in store.messages("s")] == ["four five six", "seven eight nine"]
+    assert store.stats()["dropped_messages"] == 1
+
+
+def test_the_newest_message_is_kept_even_over_budget(make_store):
+    store = make_store(max_tokens=2)
+    store.append("s", "user", "a very long message")
+    assert store.messages("s") == [{"role": "user", "content": "a very long message"}]
+
+
+def test_least_recently_used_sessions_are_evicted(make_store):
+    store = make_store(max_sessions=2)
+    store.append("a", "user", "hi")
+    store.append("b", "user", "hi")
+    store.messages("a")
+    store.append("a", "user", "again")
+    store.append("c", "user", "hi")
+    assert store.messages("b") == []
+    assert len(store.messages("a")) == 2
+    assert store.stats()["sessions"] == 2
+
+
+def test_clear(make_store):
+    store = make_store()
+    store.append("s", "user", "hi")
+    store.clear("s")
+    assert store.messages("s") == []
+
+
+def test_sqlite_sessions_are_shared(tmp_path):
+    db_path = str(tmp_path / "conversations.db")
+    SQLiteConversationStore(db_path, count_words).append("s", "user", "hi")
+    assert SQLiteConversationStore(db_path, count_words).messages("s") == [{"role": "user", "content": "hi"}]
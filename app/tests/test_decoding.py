@@ -0,0 +1,58 @@
+import pytest
+
+from decoding import TRANSLATION_PRESETS, LatencyModel, as_key, decoding_kwargs, parse_budget
+
+
+def kwargs(budget_ms, seconds_per_token=0.02, preset="quality-beam"):
+    return decoding_kwargs(TRANSLATION_PRESETS, preset, budget_ms, LatencyModel(seconds_per_token))
+
+
+def test_without_budget_the_preset_is_used_as_is():
+    assert kwargs(None) == TRANSLATION_PRESETS["quality-beam"]
+    assert decoding_kwargs(TRANSLATION_PRESETS, "balanced") == TRANSLATION_PRESETS["balanced"]
+    # A copy: callers may change it
+    assert decoding_kwargs(TRANSLATION_PRESETS, "balanced") is not TRANSLATION_PRESETS["balanced"]
+
+
+def test_a_generous_budget_changes_nothing():
+    # 5 beams x 256 tokens x 0.02 s = 25.6 s
+    assert kwargs(30000) == {"num_beams": 5, "max_new_tokens": 256}
+
+
+def test_beams_are_narrowed_before_tokens_are_capped():
+    # 4 beams afford 250 tokens, 3 beams 333: the output length is kept
+    assert kwargs(20000) == {"num_beams": 3, "max_new_tokens": 256}
+
+
+def test_max_new_tokens_is_rounded_down_to_a_multiple_of_min_new_tokens():
+    # Greedy affords 50 tokens in 1 s
+    assert kwargs(1000) == {"num_beams": 1, "max_new_tokens": 48}
+    assert decoding_kwargs(TRANSLATION_PRESETS, "quality-beam", 1000, LatencyModel(0.02), min_new_tokens=10) == {
+        "num_beams": 1, "max_new_tokens": 50}
+
+
+def test_max_new_tokens_never_drops_below_min_new_tokens():
+    assert kwargs(100) == {"num_beams": 1, "max_new_tokens": 16}
+
+
+def test_unknown_preset():
+    with pytest.raises(ValueError, match="Unknown decoding preset 'turbo'"):
+        decoding_kwargs(TRANSLATION_PRESETS, "turbo")
+
+
+def test_latency_model_follows_observations():
+    model = LatencyModel(initial_seconds_per_token=0.02, smoothing=0.5)
+    model.observe(1.0, new_tokens=10, num_beams=2)
+    assert model.seconds_per_token == pytest.approx(0.035)
+    model.observe(1.0, new_tokens=0)
+    assert model.seconds_per_token == pytest.approx(0.035)
+
+
+@pytest.mark.parametrize("value, budget", [("250", 250.0), (500, 500.0), ("0", None), ("-1", None),
+                                           ("soon", None), (None, None)])
+def test_parse_budget(value, budget):
+    assert parse_budget(value) == budget
+
+
+def test_as_key_is_order_independent():
+    assert as_key({"a": 1, "b": 2}) == as_key({"b": 2, "a": 1})
@@ -0,0 +1,54 @@
+import threading
+from multiprocessing.connection import Listener
+
+import pytest
+
+from decoding import LatencyModel
+from inference_client import InferenceClient, InferenceError
+from model_registry import ModelNotEnabled
+
+AUTHKEY = b"test"
+
+
+@pytest.fixture
+def server(tmp_path):
+    """A fake inference server answering each request with the replies queued for it."""
+    address = str(tmp_path / "inference.sock")
+    listener = Listener(address, family="AF_UNIX", authkey=AUTHKEY)
+    replies = []
+
+    def serve():
+        while True:
+            try:
+                conn = listener.accept()
+            except OSError:
+                return
+            with conn:
+                conn.recv()
+                for reply in replies.pop(0):
+                    conn.send(reply)
+
+    threading.Thread(target=serve, daemon=True).start()
+    yield address, replies
+    listener.close()
+
+
+def test_stream_text_yields_chunks_and_latency(server):
+    address, replies = server
+    replies.append([("chunk", "Hel"), ("chunk", "lo"), ("done", {"chat": 0.5})])
+    latency = {"chat": LatencyModel()}
+    chunks = InferenceClient(address, AUTHKEY, latency).stream_text("Hi", (), None)
+    assert list(chunks) == ["Hel", "lo"]
+    assert latency["chat"].seconds_per_token == 0.5
+
+
+def test_stream_text_raises_server_errors_before_iterating(server):
+    address, replies = server
+    replies.append([("error", ("ModelNotEnabled", "Model 'chat' is not enabled"))])
+    with pytest.raises(ModelNotEnabled):
+        InferenceClient(address, AUTHKEY).stream_text("Hi", (), None)
+
+
+def test_stream_text_raises_when_the_server_is_down(tmp_path):
+    with pytest.raises(InferenceError, match="unavailable"):
+        InferenceClient(str(tmp_path / "missing.sock"), AUTHKEY).stream_text("Hi", (), None)
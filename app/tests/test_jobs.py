@@ -0,0 +1,61 @@
+import threading
+import time
+
+import pytest
+
+from jobs import PRIORITIES, JobQueue, QueueFull
+
+
+def wait_for(queue, job_id, timeout=5):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        job = queue.get(job_id)
+        if job["status"] in ("done", "failed"):
+            return job
+        time.sleep(0.01)
+    raise AssertionError(f"job {job_id} did not finish")
+
+
+def test_runs_jobs_and_reports_failures():
+    def run(payload):
+        if payload < 0:
+            raise ValueError("negative")
+        return payload * 2
+
+    queue = JobQueue(run, finish=lambda payload, result: {"doubled": result})
+    assert wait_for(queue, queue.submit(21))["result"] == {"doubled": 42}
+    failed = wait_for(queue, queue.submit(-1))
+    assert failed["status"] == "failed" and failed["error"] == "negative"
+
+
+def test_priority_order_and_queue_full():
+    order = []
+    release = threading.Event()
+
+    def run(payload):
+        if payload == "blocker":
+            release.wait(5)
+        order.append(payload)
+
+    queue = JobQueue(run, workers=1, max_pending=3)
+    blocker = queue.submit("blocker")
+    # Wait until the only worker is busy with the blocker
+    while queue.get(blocker)["status"] != "running":
+        time.sleep(0.01)
+    ids = [queue.submit(priority, PRIORITIES[priority]) for priority in ("low", "normal", "high")]
+    with pytest.raises(QueueFull):
+        queue.submit("one too many")
+    release.set()
+
+    for job_id in ids:
+        wait_for(queue, job_id)
+    assert order == ["blocker", "high", "normal", "low"]
+    assert queue.stats()["rejected"] == 1
+
+
+def test_status_is_shared_through_sqlite(tmp_path):
+    db_path = str(tmp_path / "jobs.db")
+    job_id = JobQueue(lambda payload: payload, db_path=db_path).submit("hi")
+    other = JobQueue(lambda payload: payload, db_path=db_path)
+    assert wait_for(other, job_id)["result"] == "hi"
+    assert other.get("missing") is None
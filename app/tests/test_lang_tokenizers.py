@@ -0,0 +1,26 @@
+import pytest
+
+from lang_tokenizers import TokenizerPool
+
+
+class FakeTokenizer:
+    src_lang = "en"
+
+    def __call__(self, texts, **kwargs):
+        return [f"__{self.src_lang}__ {text}" for text in texts]
+
+
+def test_one_copy_per_language_with_its_own_src_lang():
+    base = FakeTokenizer()
+    pool = TokenizerPool(base, ["fr", "de"])
+    assert pool.encode(["bonjour"], "fr") == ["__fr__ bonjour"]
+    assert pool.encode(["hallo"], "de") == ["__de__ hallo"]
+    assert pool.get("fr") is pool.get("fr")
+    assert base.src_lang == "en"
+
+
+def test_languages_outside_the_pool_are_refused():
+    pool = TokenizerPool(FakeTokenizer(), ["fr"])
+    with pytest.raises(ValueError, match="'sw' not supported"):
+        pool.get("sw")
+    assert set(pool._tokenizers) == {"fr"}
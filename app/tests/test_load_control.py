@@ -0,0 +1,30 @@
+import time
+
+from load_control import GREEDY, NORMAL, SHORT, SMALL_MODEL, LoadController
+
+
+def test_degrades_one_mode_per_cooldown_and_recovers():
+    depth = [0]
+    controller = LoadController(lambda: depth[0], max_depth=10, cooldown=0, small_model=True)
+    assert controller.mode() == NORMAL
+    depth[0] = 10
+    assert [controller.mode() for _ in range(4)] == [GREEDY, SHORT, SMALL_MODEL, SMALL_MODEL]
+    depth[0] = 0
+    assert [controller.mode() for _ in range(4)] == [SHORT, GREEDY, NORMAL, NORMAL]
+
+
+def test_cooldown_holds_the_mode():
+    controller = LoadController(lambda: 10, max_depth=10, cooldown=60)
+    assert [controller.mode() for _ in range(3)] == [GREEDY, GREEDY, GREEDY]
+
+
+def test_p95_only_counts_the_window(monkeypatch):
+    now = [1000.0]
+    monkeypatch.setattr(time, "monotonic", lambda: now[0])
+    controller = LoadController(lambda: 0, max_p95_ms=1000, window_seconds=30, cooldown=0)
+    for _ in range(20):
+        controller.record(5.0)
+    assert controller.mode() == GREEDY
+    now[0] += 31
+    assert controller.p95() == 0.0
+    assert controller.mode() == NORMAL
@@ -0,0 +1,59 @@
+import threading
+import time
+
+import pytest
+
+from model_registry import ModelNotEnabled, ModelRegistry
+
+
+def test_models_load_once_on_first_use():
+    loads = []
+
+    def load():
+        loads.append(1)
+        time.sleep(0.05)
+        return {"name": "model"}
+
+    models = ModelRegistry()
+    models.register("translation", load)
+    assert not models.is_loaded("translation")
+    results = []
+    threads = [threading.Thread(target=lambda: results.append(models.get("translation"))) for _ in range(8)]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+
+    assert len(loads) == 1
+    assert all(result is results[0] for result in results)
+    assert models.is_loaded("translation")
+    assert models.stats()["translation"]["loaded"] is True
+
+
+def test_disabled_and_unknown_models_are_not_loaded():
+    models = ModelRegistry(enabled=["translation"])
+    models.register("translation", dict)
+    models.register("chat", lambda: pytest.fail("chat must not load"))
+    with pytest.raises(ModelNotEnabled):
+        models.get("chat")
+    with pytest.raises(ModelNotEnabled):
+        models.get("unknown")
+    models.warmup()
+    assert models.is_loaded("translation") and not models.is_loaded("chat")
+    assert models.stats()["chat"] == {"loaded": False, "enabled": False}
+
+
+def test_allows_models_registered_elsewhere():
+    models = ModelRegistry(enabled=["marian"])
+    assert models.allows("marian") and not models.is_enabled("marian")
+    assert not models.allows("chat")
+    assert ModelRegistry().allows("anything")
+
+
+@pytest.mark.parametrize("value, enabled", [(None, None), ("", None), ("translation, chat", {"translation", "chat"})])
+def test_from_env(monkeypatch, value, enabled):
+    if value is None:
+        monkeypatch.delenv("ENABLED_MODELS", raising=False)
+    else:
+        monkeypatch.setenv("ENABLED_MODELS", value)
+    assert ModelRegistry.from_env().enabled == enabled
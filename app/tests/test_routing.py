@@ -0,0 +1,61 @@
+from concurrent.futures import Future
+
+import pytest
+
+from decoding import LatencyModel
+from routing import RoutePlanner, RouteRunner
+from translation_cache import TranslationCache
+
+MARIAN_PAIRS = {("ja", "en"), ("en", "pt"), ("en", "fr")}
+
+
+def planner(marian_seconds_per_token=0.005):
+    return RoutePlanner(
+        {"m2m100": lambda source, target: True, "marian": lambda source, target: (source, target) in MARIAN_PAIRS},
+        latency_models={"m2m100": LatencyModel(0.02), "marian": LatencyModel(marian_seconds_per_token)},
+    )
+
+
+def test_plans_the_cheapest_route():
+    assert planner().plan("en", "fr") == [("marian", "en", "fr")]
+    assert planner().plan("ja", "pt") == [("marian", "ja", "en"), ("marian", "en", "pt")]
+    # Two slow legs cost more than one direct M2M100 leg
+    assert planner(0.015).plan("ja", "pt") == [("m2m100", "ja", "pt")]
+    assert planner().plan("ja", "pt", allowed=("m2m100",)) == [("m2m100", "ja", "pt")]
+
+
+def test_no_route():
+    with pytest.raises(ValueError, match="No route"):
+        RoutePlanner({"marian": lambda source, target: False}).plan("ja", "pt")
+
+
+def done(value):
+    future = Future()
+    future.set_result(value)
+    return future
+
+
+def test_pivot_first_leg_is_shared_and_cached():
+    legs = []
+
+    def submit(text, source_lang, target_lang, backend, *key):
+        legs.append((text, source_lang, target_lang))
+        return done(f"{target_lang}({text})")
+
+    runner = RouteRunner(submit, cache=TranslationCache("pivot"))
+    route_pt = [("marian", "ja", "en"), ("marian", "en", "pt")]
+    route_fr = [("marian", "ja", "en"), ("marian", "en", "fr")]
+    assert runner.submit("konnichiwa", route_pt, "greedy").result(timeout=5) == "pt(en(konnichiwa))"
+    assert runner.submit("konnichiwa", route_fr, "greedy").result(timeout=5) == "fr(en(konnichiwa))"
+    assert legs.count(("konnichiwa", "ja", "en")) == 1
+
+
+def test_pivot_errors_reach_the_caller():
+    def submit(text, source_lang, target_lang, backend, *key):
+        future = Future()
+        future.set_exception(RuntimeError("first leg failed"))
+        return future
+
+    result = RouteRunner(submit).submit("a", [("marian", "ja", "en"), ("marian", "en", "pt")])
+    with pytest.raises(RuntimeError, match="first leg failed"):
+        result.result(timeout=5)
@@ -0,0 +1,21 @@
+from segmentation import join_sentences, split_sentences
+
+
+def test_split_and_join_round_trip():
+    text = "Hello there. How are you?\n\nFine!"
+    segments = split_sentences(text)
+    assert [sentence for sentence, _ in segments] == ["Hello there.", "How are you?", "Fine!"]
+    assert join_sentences([s for s, _ in segments], [sep for _, sep in segments], "fr") == text
+
+
+def test_cjk_sentences_and_no_space_join():
+    segments = split_sentences("你好。再见！")
+    assert [sentence for sentence, _ in segments] == ["你好。", "再见！"]
+    assert join_sentences(["a", "b"], [sep for _, sep in segments], "zh") == "ab"
+
+
+def test_long_sentences_are_cut():
+    sentence = ", ".join(["word word word"] * 50)
+    pieces = [piece for piece, _ in split_sentences(sentence, max_chars=40)]
+    assert all(len(piece) <= 40 for piece in pieces)
+    assert " ".join(pieces).replace(" ", "") == sentence.replace(" ", "")
@@ -0,0 +1,90 @@
+import os
+import threading
+import time
+import wave
+
+from audio_store import AudioStore
+from speech import SpeechService
+from tts_backends import StubBackend
+
+
+class GatedBackend(StubBackend):
+    """The stub backend, holding every synthesis until `release` is set (or failing it)."""
+
+    def __init__(self, fail=False):
+        self.release = threading.Event()
+        self.fail = fail
+
+    def synthesize(self, text, lang, filepath):
+        self.release.wait(5)
+        if self.fail:
+            raise RuntimeError("synthesis failed")
+        super().synthesize(text, lang, filepath)
+
+
+def store(directory):
+    return AudioStore(str(directory), voice=StubBackend.name, extension=StubBackend.extension)
+
+
+def wait_for_state(service, filename, state, timeout=5):
+    deadline = time.monotonic() + timeout
+    while service.status(filename) != state and time.monotonic() < deadline:
+        time.sleep(0.01)
+    return service.status(filename)
+
+
+def test_stub_backend_is_deterministic(tmp_path):
+    first, second = tmp_path / "a.wav", tmp_path / "b.wav"
+    StubBackend().synthesize("hello", "en", str(first))
+    StubBackend().synthesize("hello", "en", str(second))
+    assert first.read_bytes() == second.read_bytes()
+    with wave.open(str(first)) as wav:
+        assert wav.getframerate() == StubBackend.sample_rate and wav.getnframes() > 0
+
+
+def test_request_pending_then_ready(tmp_path):
+    backend = GatedBackend()
+    service = SpeechService(store(tmp_path), backend)
+    url, status = service.request("hello", "en")
+    filename = os.path.basename(url)
+    assert status == "pending"
+    assert service.status(filename) == "pending"
+
+    backend.release.set()
+    assert wait_for_state(service, filename, "ready") == "ready"
+    assert service.request("hello", "en") == (url, "ready")
+    # Only the audio is left in the directory, no markers or temporary files
+    assert os.listdir(tmp_path) == [filename]
+
+
+def test_status_from_another_service_on_the_same_directory(tmp_path):
+    backend = GatedBackend()
+    url, _ = SpeechService(store(tmp_path), backend).request("hello", "en")
+    filename = os.path.basename(url)
+    other = SpeechService(store(tmp_path), StubBackend())
+    assert other.status(filename) == "pending"
+
+    backend.release.set()
+    assert wait_for_state(other, filename, "ready") == "ready"
+    assert other.status("tts_unknown.wav") == "missing"
+
+
+def test_failures_are_seen_by_every_service(tmp_path):
+    backend = GatedBackend(fail=True)
+    backend.release.set()
+    url, _ = SpeechService(store(tmp_path), backend).request("hello", "en")
+    other = SpeechService(store(tmp_path), StubBackend())
+    assert wait_for_state(other, os.path.basename(url), "failed") == "failed"
+
+
+def test_stale_pending_marker_counts_as_failed(tmp_path):
+    audio = store(tmp_path)
+    filename = audio.filename_for("hello", "en")
+    audio.set_state(filename, "pending")
+    assert audio.state(filename) == "pending"
+    # Left behind by a worker that died while synthesizing
+    old = time.time() - 600
+    os.utime(os.path.join(tmp_path, f"{filename}.pending"), (old, old))
+    assert audio.state(filename, pending_timeout=300) == "failed"
+    audio.set_state(filename, None)
+    assert audio.state(filename) == "missing"
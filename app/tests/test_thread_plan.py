@@ -0,0 +1,31 @@
+import sys
+
+import pytest
+
+from thread_plan import current, plan_threads
+
+
+def test_cpus_are_split_between_workers():
+    plans = [plan_threads(3, slot, cpus=range(8)) for slot in range(3)]
+    assert [plan["cpus"] for plan in plans] == [[0, 1, 2], [3, 4, 5], [6, 7]]
+    assert [plan["intra_op_threads"] for plan in plans] == [3, 3, 2]
+    assert all(plan["inter_op_threads"] == 1 for plan in plans)
+
+
+def test_more_workers_than_cpus_share_round_robin():
+    plans = [plan_threads(4, slot, cpus=[0, 1]) for slot in range(4)]
+    assert [plan["cpus"] for plan in plans] == [[0], [1], [0], [1]]
+    assert all(plan["intra_op_threads"] == 1 for plan in plans)
+
+
+def test_overrides_and_slot_wraparound():
+    plan = plan_threads(2, 3, cpus=range(4), intra_op_threads=8, inter_op_threads=2)
+    assert plan["slot"] == 1 and plan["cpus"] == [2, 3]
+    assert (plan["intra_op_threads"], plan["inter_op_threads"]) == (8, 2)
+
+
+@pytest.mark.skipif("torch" in sys.modules, reason="torch is already imported")
+def test_current_does_not_import_torch():
+    report = current()
+    assert "torch" not in sys.modules
+    assert report["torch_threads"] is None and report["cpus"]
@@ -0,0 +1,40 @@
+import time
+
+from translation_cache import TranslationCache, make_key
+
+
+def test_key_normalizes_text_and_separates_variants():
+    assert make_key("a  b\n", "en", "fr", "m") == make_key("a b", "en", "fr", "m")
+    assert make_key("a", "en", "fr", "m", ("beam", 4)) != make_key("a", "en", "fr", "m", ("greedy",))
+
+
+def test_lru_is_bounded_by_bytes():
+    cache = TranslationCache("m", max_bytes=200)
+    for i in range(10):
+        cache.set(f"text {i}", "en", "fr", f"texte {i}")
+    assert cache.stats()["bytes"] <= 200
+    assert cache.get("text 9", "en", "fr") == "texte 9"
+    assert cache.get("text 0", "en", "fr") is None
+
+
+def test_ttl(monkeypatch):
+    cache = TranslationCache("m", ttl=10)
+    cache.set("a", "en", "fr", "b")
+    now = time.time()
+    monkeypatch.setattr(time, "time", lambda: now + 11)
+    assert cache.get("a", "en", "fr") is None
+
+
+def test_sqlite_tier_is_shared_and_pruned(tmp_path):
+    db_path = str(tmp_path / "cache.db")
+    writer = TranslationCache("m", db_path=db_path, max_rows=5, prune_every=4)
+    for i in range(8):
+        writer.set(f"text {i}", "en", "fr", f"texte {i}")
+
+    reader = TranslationCache("m", db_path=db_path)
+    assert reader.get("text 7", "en", "fr") == "texte 7"
+    assert reader.stats()["disk_hits"] == 1
+    # Pruned after the 8th write: only the 5 newest rows are left
+    assert reader.get("text 0", "en", "fr") is None
+    rows = reader._db.get().execute("SELECT COUNT(*) FROM translations").fetchone()[0]
+    assert rows == 5
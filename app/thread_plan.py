@@ -0,0 +1,85 @@
+import os
+import sys
+import threading
+
+# The plan applied in this process (see apply_plan), reported by /debug/threads
+_current = None
+_lock = threading.Lock()
+
+
+def available_cpus():
+    """The CPUs this process may run on (its affinity mask, e.g. as limited by a container)."""
+    if hasattr(os, "sched_getaffinity"):
+        return sorted(os.sched_getaffinity(0))
+    return list(range(os.cpu_count() or 1))
+
+
+def plan_threads(workers, slot, cpus=None, intra_op_threads=None, inter_op_threads=None):
+    """
+    The CPUs and torch thread counts of worker `slot` out of `workers`.
+
+    The CPUs are split into `workers` contiguous groups (the first groups get
+    one more CPU when they don't divide evenly), so every worker runs its
+    intra-op threads on cores of its own. With more workers than CPUs, the
+    workers share CPUs round-robin with one thread each. `intra_op_threads`
+    and `inter_op_threads` override the computed counts.
+    """
+    cpus = list(cpus if cpus is not None else available_cpus())
+    slot %= workers
+    if workers <= len(cpus):
+        size, extra = divmod(len(cpus), workers)
+        start = slot * size + min(slot, extra)
+        group = cpus[start:start + size + (slot < extra)]
+    else:
+        group = [cpus[slot % len(cpus)]]
+    return {
+        "workers": workers,
+        "slot": slot,
+        "cpus": group,
+        "intra_op_threads": intra_op_threads or len(group),
+        # generate() runs its ops one after another, so one inter-op thread is enough
+        "inter_op_threads": inter_op_threads or 1,
+    }
+
+
+def apply_plan(plan, pin=True):
+    """
+    Set torch's thread counts from `plan` and, with `pin`, restrict this
+    process to the plan's CPUs. Returns the plan with what was actually
+    applied: the inter-op thread count can't change once torch has started
+    its inter-op pool (e.g. in a preloaded master), then the current one is kept.
+    """
+    import torch
+
+    global _current
+    applied = dict(plan, pinned=False, pid=os.getpid())
+    if pin and hasattr(os, "sched_setaffinity"):
+        os.sched_setaffinity(0, plan["cpus"])
+        applied["pinned"] = True
+    torch.set_num_threads(plan["intra_op_threads"])
+    try:
+        torch.set_num_interop_threads(plan["inter_op_threads"])
+    except RuntimeError:
+        applied["inter_op_threads"] = torch.get_num_interop_threads()
+    with _lock:
+        _current = applied
+    return applied
+
+
+def current():
+    """
+    The plan applied in this process (None if none was) and the live
+    affinity and torch settings. torch is not imported for this: in a process
+    without it (e.g. a thin HTTP worker) its thread counts are None.
+    """
+    with _lock:
+        plan = dict(_current) if _current is not None else None
+    torch = sys.modules.get("torch")
+    return {
+        "pid": os.getpid(),
+        "plan": plan,
+        "cpus": available_cpus(),
+        "cpu_count": os.cpu_count(),
+        "torch_threads": torch.get_num_threads() if torch is not None else None,
+        "torch_interop_threads": torch.get_num_interop_threads() if torch is not None else None,
+    }
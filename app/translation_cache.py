@@ -0,0 +1,146 @@
+import hashlib
+import threading
+import time
+import unicodedata
+from collections import OrderedDict
+
+from fork_safe import SQLiteConnections
+
+
+def normalize_text(text):
+    """Normalize text so trivially different inputs share a cache entry."""
+    text = unicodedata.normalize("NFC", text)
+    return " ".join(text.split())
+
+
+def make_key(text, source_lang, target_lang, model_name, variant=None):
+    parts = [model_name, source_lang, target_lang, normalize_text(text)]
+    if variant is not None:
+        parts.append(repr(variant))
+    raw = "\x1f".join(parts)
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+class TranslationCache:
+    """
+    Content-addressed cache of finished translations.
+
+    The first tier is an in-process LRU bounded by bytes. The optional second
+    tier is a SQLite file, so several gunicorn workers on the same host share
+    their results. Entries older than `ttl` seconds are treated as missing
+    (ttl=0 disables expiry). `variant` (e.g. the decoding settings) keeps
+    translations of the same text made in different ways apart.
+
+    The SQLite tier keeps at most `max_rows` rows: every `prune_every` writes,
+    expired rows and then the oldest rows beyond the cap are deleted.
+    """
+
+    def __init__(self, model_name, max_bytes=64 * 1024 * 1024, ttl=0, db_path=None, max_rows=100_000,
+                 prune_every=256):
+        self.model_name = model_name
+        self.max_bytes = max_bytes
+        self.ttl = ttl
+        self.db_path = db_path
+        self.max_rows = max_rows
+        self.prune_every = prune_every
+        self._writes = 0
+        self._entries = OrderedDict()  # key -> (value, created, size)
+        self._bytes = 0
+        self._lock = threading.Lock()
+        self._db = SQLiteConnections(db_path) if db_path else None
+        self.hits = 0
+        self.disk_hits = 0
+        self.misses = 0
+
+        if db_path:
+            with self._db.get() as conn:
+                conn.execute(
+                    "CREATE TABLE IF NOT EXISTS translations ("
+                    "key TEXT PRIMARY KEY, value TEXT NOT NULL, created REAL NOT NULL)"
+                )
+                conn.execute("CREATE INDEX IF NOT EXISTS translations_created ON translations (created)")
+
+    def _expired(self, created):
+        return self.ttl > 0 and time.time() - created > self.ttl
+
+    def _remember(self, key, value, created):
+        size = len(key) + len(value.encode("utf-8"))
+        if size > self.max_bytes:
+            return
+        with self._lock:
+            old = self._entries.pop(key, None)
+            if old is not None:
+                self._bytes -= old[2]
+            self._entries[key] = (value, created, size)
+            self._bytes += size
+            while self._bytes > self.max_bytes:
+                _, (_, _, evicted) = self._entries.popitem(last=False)
+                self._bytes -= evicted
+
+    def get(self, text, source_lang, target_lang, variant=None):
+        """Return the cached translation or None."""
+        key = make_key(text, source_lang, target_lang, self.model_name, variant)
+
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is not None:
+                if self._expired(entry[1]):
+                    del self._entries[key]
+                    self._bytes -= entry[2]
+                else:
+                    self._entries.move_to_end(key)
+                    self.hits += 1
+                    return entry[0]
+
+        if self.db_path:
+            row = self._db.get().execute(
+                "SELECT value, created FROM translations WHERE key = ?", (key,)
+            ).fetchone()
+            if row is not None and not self._expired(row[1]):
+                self._remember(key, row[0], row[1])
+                with self._lock:
+                    self.disk_hits += 1
+                return row[0]
+
+        with self._lock:
+            self.misses += 1
+        return None
+
+    def set(self, text, source_lang, target_lang, translation, variant=None):
+        key = make_key(text, source_lang, target_lang, self.model_name, variant)
+        created = time.time()
+        self._remember(key, translation, created)
+        if self.db_path:
+            with self._db.get() as conn:
+                conn.execute(
+                    "INSERT OR REPLACE INTO translations (key, value, created) VALUES (?, ?, ?)",
+                    (key, translation, created),
+                )
+            with self._lock:
+                self._writes += 1
+                prune = self._writes % self.prune_every == 0
+            if prune:
+                self.prune()
+
+    def prune(self):
+        """Delete the SQLite tier's expired rows, then its oldest rows beyond `max_rows`."""
+        with self._db.get() as conn:
+            if self.ttl > 0:
+                conn.execute("DELETE FROM translations WHERE created < ?", (time.time() - self.ttl,))
+            conn.execute(
+                "DELETE FROM translations WHERE key IN "
+                "(SELECT key FROM translations ORDER BY created DESC LIMIT -1 OFFSET ?)",
+                (self.max_rows,),
+            )
+
+    def stats(self):
+        lookups = self.hits + self.disk_hits + self.misses
+        return {
+            "entries": len(self._entries),
+            "bytes": self._bytes,
+            "max_bytes": self.max_bytes,
+            "hits": self.hits,
+            "disk_hits": self.disk_hits,
+            "misses": self.misses,
+            "hit_rate": ((self.hits + self.disk_hits) / lookups) if lookups else 0.0,
+        }
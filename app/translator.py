@@ -0,0 +1,77 @@
+import time
+
+from bucketing import length_buckets
+from lang_tokenizers import TokenizerPool
+
+# Map language names to M2M100 language codes
+LANGUAGES = {
+    'English': 'en',
+    'French': 'fr',
+    'Spanish': 'es',
+    'German': 'de',
+    'Italian': 'it',
+    'Portuguese': 'pt',
+    'Russian': 'ru',
+    'Chinese': 'zh',
+    'Japanese': 'ja',
+    'Arabic': 'ar'
+}
+
+# The M2M100 model shared by the web app and the bulk translation CLI
+model_name = "facebook/m2m100_418M"
+
+
+def load_translation_model(quantization="fp32"):
+    """Load the M2M100 model & tokenizer, in the given inference precision."""
+    # Imported here, so LANGUAGES can be used without torch (e.g. by the HTTP
+    # workers of an inference server)
+    from transformers import M2M100ForConditionalGeneration, M2M100Tokenizer
+    import sentencepiece  # Needed by M2M100 for tokenization
+
+    from quantization import quantize
+
+    tokenizer = M2M100Tokenizer.from_pretrained(model_name)
+    model = quantize(M2M100ForConditionalGeneration.from_pretrained(model_name), quantization)
+    # One tokenizer per source language, so no request ever mutates `src_lang`
+    return {"tokenizers": TokenizerPool(tokenizer, LANGUAGES.values()), "model": model}
+
+
+def translate_batch(translation_model, texts, source_lang, target_lang, max_batch_size=16, padding_stats=None,
+                    generate_kwargs=None, latency_model=None):
+    """
+    Translate a list of texts that share the same language pair.
+
+    The texts are tokenized once, grouped into buckets of similar token
+    length and every bucket is padded and run as one `generate` call, so a
+    short hashtag is never padded up to a long caption. Results come back in
+    the original order; `padding_stats` (a PaddingStats) records the padding.
+    `generate_kwargs` (see decoding.py) select the decoding strategy, and the
+    measured cost per token is fed to `latency_model` (a LatencyModel).
+    """
+    generate_kwargs = generate_kwargs or {}
+    tokenizers = translation_model["tokenizers"]
+    model = translation_model["model"]
+    tokenizer = tokenizers.get(source_lang)
+    input_ids = tokenizer(texts)["input_ids"]
+    lengths = [len(ids) for ids in input_ids]
+
+    translations = [None] * len(texts)
+    for bucket in length_buckets(lengths, max_batch_size):
+        encoded = tokenizer.pad({"input_ids": [input_ids[i] for i in bucket]}, return_tensors="pt")
+        if padding_stats is not None:
+            padding_stats.record([lengths[i] for i in bucket])
+
+        # Generate translations, specifying the target language
+        start = time.perf_counter()
+        generated_tokens = model.generate(
+            **encoded,
+            forced_bos_token_id=tokenizers.get_lang_id(target_lang),
+            **generate_kwargs
+        )
+        if latency_model is not None:
+            latency_model.observe(
+                time.perf_counter() - start, generated_tokens.shape[1], generate_kwargs.get("num_beams", 1)
+            )
+        for i, translation in zip(bucket, tokenizers.batch_decode(generated_tokens, skip_special_tokens=True)):
+            translations[i] = translation
+    return translations
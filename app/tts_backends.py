@@ -0,0 +1,86 @@
+import hashlib
+import shutil
+import struct
+import subprocess
+import wave
+
+
+class TTSBackend:
+    """
+    A text-to-speech engine. Subclasses write the audio for `text` in
+    language `lang` to `filepath`.
+    """
+
+    name = "base"
+    extension = "mp3"
+
+    def synthesize(self, text, lang, filepath):
+        raise NotImplementedError
+
+
+class GTTSBackend(TTSBackend):
+    """Google Translate TTS (needs network access)."""
+
+    name = "gtts"
+    extension = "mp3"
+
+    def synthesize(self, text, lang, filepath):
+        from gtts import gTTS
+
+        tts = gTTS(text=text, lang=lang)
+        tts.save(filepath)
+
+
+class EspeakBackend(TTSBackend):
+    """Local offline synthesis through the espeak-ng (or espeak) command."""
+
+    name = "espeak"
+    extension = "wav"
+
+    def __init__(self, executable=None):
+        self.executable = executable or shutil.which("espeak-ng") or shutil.which("espeak")
+        if self.executable is None:
+            raise RuntimeError("espeak-ng is not installed; install it or choose another TTS backend.")
+
+    def synthesize(self, text, lang, filepath):
+        subprocess.run(
+            [self.executable, "-v", lang, "-w", filepath, "--stdin"],
+            input=text.encode("utf-8"),
+            check=True,
+            capture_output=True,
+        )
+
+
+class StubBackend(TTSBackend):
+    """
+    Deterministic backend for tests and local development: writes a short
+    WAV tone derived from the text, without any network or audio engine.
+    """
+
+    name = "stub"
+    extension = "wav"
+    sample_rate = 8000
+
+    def synthesize(self, text, lang, filepath):
+        digest = hashlib.sha256(f"{lang}:{text}".encode("utf-8")).digest()
+        frames = b"".join(struct.pack("<h", (b - 128) * 64) for b in digest * 8)
+        with wave.open(filepath, "wb") as wav:
+            wav.setnchannels(1)
+            wav.setsampwidth(2)
+            wav.setframerate(self.sample_rate)
+            wav.writeframes(frames)
+
+
+BACKENDS = {
+    GTTSBackend.name: GTTSBackend,
+    EspeakBackend.name: EspeakBackend,
+    StubBackend.name: StubBackend,
+}
+
+
+def get_backend(name):
+    """Instantiate a TTS backend by name ('gtts', 'espeak' or 'stub')."""
+    try:
+        return BACKENDS[name]()
+    except KeyError:
+        raise ValueError(f"Unknown TTS backend '{name}'. Choose one of: {', '.join(BACKENDS)}")
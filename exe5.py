@@ -1,6 +1,7 @@
 from flask import Flask, request, render_template_string
 from transformers import MarianMTModel, MarianTokenizer
 from time import sleep
+import os
 
 app = Flask(__name__)
 
@@ -224,4 +225,5 @@ HTML = """
 """
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    # FLASK_DEBUG=1 for debug mode; no reloader, which would load the models twice
+    app.run(debug=os.environ.get("FLASK_DEBUG") == "1", use_reloader=False)
\ No newline at end of file
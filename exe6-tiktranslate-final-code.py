@@ -2,6 +2,7 @@ from flask import Flask, request, render_template_string
 from transformers import M2M100ForConditionalGeneration, M2M100Tokenizer
 from langdetect import detect, LangDetectException
 import sentencepiece  # Needed by M2M100 for tokenization
+import os
 
 app = Flask(__name__)
 
@@ -293,4 +294,5 @@ def home():
     )
 
 if __name__ == '__main__':
-    app.run(debug=True)
+    # FLASK_DEBUG=1 for debug mode; no reloader, which would load the models twice
+    app.run(debug=os.environ.get("FLASK_DEBUG") == "1", use_reloader=False)
@@ -1,6 +1,7 @@
 from flask import Flask, request, render_template_string
 from transformers import MarianMTModel, MarianTokenizer
 import sentencepiece  # Required dependency
+import os
 
 app = Flask(__name__)
 
@@ -279,4 +280,5 @@ HTML = """
 """
 
 if __name__ == '__main__':
-    app.run(debug=True)
\ No newline at end of file
+    # FLASK_DEBUG=1 for debug mode; no reloader, which would load the models twice
+    app.run(debug=os.environ.get("FLASK_DEBUG") == "1", use_reloader=False)
\ No newline at end of file
@@ -4,6 +4,7 @@ from langdetect import detect, LangDetectException
 import sentencepiece  # Needed by M2M100 for tokenization
 from gtts import gTTS
 import os
+import threading
 import uuid
 
 app = Flask(__name__)
@@ -27,6 +28,10 @@ model_name = "facebook/m2m100_418M"
 tokenizer = M2M100Tokenizer.from_pretrained(model_name)
 model = M2M100ForConditionalGeneration.from_pretrained(model_name)
 
+# `tokenizer.src_lang` is shared state: setting it and encoding must happen
+# together, otherwise concurrent requests can get the wrong language tag
+tokenizer_lock = threading.Lock()
+
 HTML = """
 <!DOCTYPE html>
 <html>
@@ -285,11 +290,12 @@ def home():
 
                 # Proceed if no detection error
                 if not error:
-                    # Tell the tokenizer what the source language is
-                    tokenizer.src_lang = source_lang
+                    # Tell the tokenizer what the source language is and encode the text
+                    with tokenizer_lock:
+                        tokenizer.src_lang = source_lang
+                        encoded = tokenizer(input_text, return_tensors="pt")
 
-                    # Encode the text, then force the target language in generation
-                    encoded = tokenizer(input_text, return_tensors="pt")
+                    # Force the target language in generation
                     generated_tokens = model.generate(
                         **encoded,
                         forced_bos_token_id=tokenizer.get_lang_id(target_lang)
@@ -329,4 +335,5 @@ if __name__ == '__main__':
     # Make sure there's a 'static' folder to save the MP3 files
     if not os.path.exists("static"):
         os.makedirs("static")
-    app.run(debug=True)
+    # FLASK_DEBUG=1 for debug mode; no reloader, which would load the models twice
+    app.run(debug=os.environ.get("FLASK_DEBUG") == "1", use_reloader=False)
@@ -1,11 +1,18 @@
 from transformers import GPT2LMHeadModel, GPT2Tokenizer
-import torch
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "app"))
+from quantization import quantize
 
 # Carrega o modelo e o tokenizador GPT-2 (versão pequena)
 model_name = "gpt2"
 tokenizer = GPT2Tokenizer.from_pretrained(model_name)
 model = GPT2LMHeadModel.from_pretrained(model_name)
 
+# Optional quantized inference on CPU: QUANTIZATION=int8 (dynamic) or bf16 (see app/quantization.py)
+model = quantize(model, os.environ.get("QUANTIZATION", "fp32"))
+
 # Prompt inicial
 prompt = "The future of AI in World is"
 
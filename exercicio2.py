@@ -1,11 +1,18 @@
 from transformers import GPT2LMHeadModel, GPT2Tokenizer
-import torch
+import os
+import sys
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "app"))
+from quantization import quantize
 
 # 1. Carregar Modelo e Tokenizador
 model_name = "gpt2-medium"
 tokenizer = GPT2Tokenizer.from_pretrained(model_name)
 model = GPT2LMHeadModel.from_pretrained(model_name)
 
+# Optional quantized inference on CPU: QUANTIZATION=int8 (dynamic) or bf16 (see app/quantization.py)
+model = quantize(model, os.environ.get("QUANTIZATION", "fp32"))
+
 # 2. Definir Prompt com Exemplo de In-Context Learning
 prompt = """
 Translate the next statements to Portugues: